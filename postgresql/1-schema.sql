@@ -1,3 +1,8 @@
+---
+--- Every statement of this file can be run again: running it on an existing database creates
+--- what is missing and replaces the functions and triggers
+---
+
 ---
 --- uuid extension
 ---
@@ -16,7 +21,13 @@ CREATE TABLE IF NOT EXISTS "user" (
 ---
 --- name table
 ---
-CREATE TYPE "name_gender_type" AS ENUM ('M', 'F');
+DO $$
+BEGIN
+    CREATE TYPE "name_gender_type" AS ENUM ('M', 'F');
+EXCEPTION WHEN duplicate_object THEN
+    NULL;
+END;
+$$;
 
 CREATE TABLE IF NOT EXISTS "name" (
     id UUID PRIMARY KEY,
@@ -28,6 +39,30 @@ CREATE TABLE IF NOT EXISTS "name" (
 );
 
 CREATE INDEX IF NOT EXISTS "name_gender_idx" ON "name" ("gender");
+CREATE INDEX IF NOT EXISTS "name_value_id_idx" ON "name" ("value", "id");
+CREATE INDEX IF NOT EXISTS "name_gender_value_id_idx" ON "name" ("gender", "value", "id");
+
+---
+--- name_catalog_version table: version of the name table, bumped on each write
+---
+CREATE TABLE IF NOT EXISTS "name_catalog_version" (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL
+);
+
+INSERT INTO "name_catalog_version" (id, version) VALUES (1, 1) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION "name_catalog_bump_version"() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE "name_catalog_version" SET version = version + 1 WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "name_catalog_version_trg" ON "name";
+CREATE TRIGGER "name_catalog_version_trg"
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "name"
+    FOR EACH STATEMENT EXECUTE FUNCTION "name_catalog_bump_version"();
 
 ---
 --- game table
@@ -42,6 +77,7 @@ CREATE TABLE IF NOT EXISTS "game" (
 );
 
 CREATE INDEX IF NOT EXISTS "game_owner_id_idx" ON "game" ("owner_id");
+CREATE INDEX IF NOT EXISTS "game_created_at_id_idx" ON "game" ("created_at", "id");
 
 ---
 --- game_guest table
@@ -69,10 +105,124 @@ CREATE TABLE IF NOT EXISTS "game_first_stage" (
     user_id UUID NOT NULL REFERENCES "user",
     name_id UUID NOT NULL REFERENCES "name",
     choice BOOLEAN NOT NULL,
-    UNIQUE (game_id, user_id, name_id)
+    UNIQUE (game_id, user_id, name_id) INCLUDE (choice)
 );
 
 CREATE INDEX IF NOT EXISTS "game_first_stage_game_id_idx" ON "game_first_stage" ("game_id");
 CREATE INDEX IF NOT EXISTS "game_first_stage_user_id_idx" ON "game_first_stage" ("user_id");
 CREATE INDEX IF NOT EXISTS "game_first_stage_name_id_idx" ON "game_first_stage" ("name_id");
 CREATE INDEX IF NOT EXISTS "game_first_stage_choice_idx" ON "game_first_stage" ("choice");
+
+---
+--- game_name_tally table: number of positive first stage choices per name made by the
+--- current members of a game, maintained by the triggers below
+---
+CREATE TABLE IF NOT EXISTS "game_name_tally" (
+    game_id UUID NOT NULL REFERENCES "game" ON DELETE CASCADE,
+    name_id UUID NOT NULL REFERENCES "name" ON DELETE CASCADE,
+    yes_count INTEGER NOT NULL,
+    PRIMARY KEY (game_id, name_id)
+);
+
+CREATE INDEX IF NOT EXISTS "game_name_tally_game_id_yes_count_idx" ON "game_name_tally" ("game_id", "yes_count");
+
+CREATE OR REPLACE FUNCTION "game_is_member"(p_game_id UUID, p_user_id UUID) RETURNS BOOLEAN AS $$
+    SELECT EXISTS (SELECT 1 FROM "game" WHERE id = p_game_id AND owner_id = p_user_id)
+        OR EXISTS (SELECT 1 FROM "game_guest" WHERE game_id = p_game_id AND user_id = p_user_id);
+$$ LANGUAGE sql STABLE;
+
+--- The membership of a voter and the choices of a guest being added or removed are read
+--- under a lock of the game: choices take a key share lock, like the foreign key checks,
+--- and guest changes an update lock, so the tally never counts a choice against a membership
+--- which changes concurrently. Game updates, which take a no key update lock, do not wait
+--- for the choices.
+CREATE OR REPLACE FUNCTION "game_name_tally_choice"() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM 1 FROM "game" WHERE id = OLD.game_id FOR KEY SHARE;
+    ELSE
+        PERFORM 1 FROM "game" WHERE id = NEW.game_id FOR KEY SHARE;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.choice AND "game_is_member"(OLD.game_id, OLD.user_id) THEN
+        UPDATE "game_name_tally" SET yes_count = yes_count - 1
+        WHERE game_id = OLD.game_id AND name_id = OLD.name_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.choice AND "game_is_member"(NEW.game_id, NEW.user_id) THEN
+        INSERT INTO "game_name_tally" (game_id, name_id, yes_count) VALUES (NEW.game_id, NEW.name_id, 1)
+        ON CONFLICT (game_id, name_id) DO UPDATE SET yes_count = "game_name_tally".yes_count + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "game_name_tally_choice_trg" ON "game_first_stage";
+CREATE TRIGGER "game_name_tally_choice_trg"
+    AFTER INSERT OR UPDATE OR DELETE ON "game_first_stage"
+    FOR EACH ROW EXECUTE FUNCTION "game_name_tally_choice"();
+
+--- Taken before the row is written: the foreign key check of the row takes a key share lock
+--- of the game, and two guest changes holding it would deadlock on the update lock
+CREATE OR REPLACE FUNCTION "game_name_tally_guest_lock"() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM 1 FROM "game" WHERE id = OLD.game_id FOR UPDATE;
+        RETURN OLD;
+    END IF;
+
+    PERFORM 1 FROM "game" WHERE id = NEW.game_id FOR UPDATE;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "game_name_tally_guest_lock_trg" ON "game_guest";
+CREATE TRIGGER "game_name_tally_guest_lock_trg"
+    BEFORE INSERT OR DELETE ON "game_guest"
+    FOR EACH ROW EXECUTE FUNCTION "game_name_tally_guest_lock"();
+
+CREATE OR REPLACE FUNCTION "game_name_tally_guest"() RETURNS TRIGGER AS $$
+BEGIN
+    -- The owner is always a member of the game
+    IF TG_OP = 'INSERT' AND NOT EXISTS (SELECT 1 FROM "game" WHERE id = NEW.game_id AND owner_id = NEW.user_id) THEN
+        INSERT INTO "game_name_tally" (game_id, name_id, yes_count)
+        SELECT game_id, name_id, 1 FROM "game_first_stage"
+        WHERE game_id = NEW.game_id AND user_id = NEW.user_id AND choice
+        ON CONFLICT (game_id, name_id) DO UPDATE SET yes_count = "game_name_tally".yes_count + 1;
+    END IF;
+
+    IF TG_OP = 'DELETE' AND NOT EXISTS (SELECT 1 FROM "game" WHERE id = OLD.game_id AND owner_id = OLD.user_id) THEN
+        UPDATE "game_name_tally" t SET yes_count = t.yes_count - 1
+        FROM "game_first_stage" s
+        WHERE s.game_id = OLD.game_id AND s.user_id = OLD.user_id AND s.choice
+            AND t.game_id = s.game_id AND t.name_id = s.name_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS "game_name_tally_guest_trg" ON "game_guest";
+CREATE TRIGGER "game_name_tally_guest_trg"
+    AFTER INSERT OR DELETE ON "game_guest"
+    FOR EACH ROW EXECUTE FUNCTION "game_name_tally_guest"();
+
+--- Recompute the tally of a game from its choices
+CREATE OR REPLACE FUNCTION "game_name_tally_rebuild"(p_game_id UUID) RETURNS VOID AS $$
+BEGIN
+    PERFORM 1 FROM "game" WHERE id = p_game_id FOR UPDATE;
+
+    DELETE FROM "game_name_tally" WHERE game_id = p_game_id;
+
+    INSERT INTO "game_name_tally" (game_id, name_id, yes_count)
+    SELECT game_id, name_id, COUNT(*) FROM "game_first_stage"
+    WHERE game_id = p_game_id AND choice AND "game_is_member"(game_id, user_id)
+    GROUP BY game_id, name_id;
+END;
+$$ LANGUAGE plpgsql;
+
+--- Fill the tally of the games created before it existed. Afterwards, a drifted tally can be
+--- recomputed with the commands.rebuild_tally command of the server.
+SELECT "game_name_tally_rebuild"(id) FROM "game"
+WHERE NOT EXISTS (SELECT 1 FROM "game_name_tally");
@@ -1,9 +1,9 @@
 import logging
-import re
 
 from app.auth import configure_auth
 from app.auth.remote import RemoteAuth
 from fastapi import FastAPI
+from typing import Dict, List, Optional
 
 
 VERSION = (1, 0, 0)
@@ -18,10 +18,29 @@ def get_app(
     debug: bool = False,
     production: bool = True,
     app_prefix: str = '',
-    auth_header: str = 'X-Remote-User'
+    auth_header: str = 'X-Remote-User',
+    auth_cache_size: int = 1024,
+    auth_cache_ttl: float = 60,
+    name_catalog_check_interval: float = 0,
+    fast_json: bool = False,
+    names_cache_max_age: int = 0,
+    body_max_size: int = 10 * 1024 * 1024,
+    metrics: bool = False,
+    access_log_sample_rate: float = 1,
+    access_log_sampling: Optional[Dict[str, float]] = None,
+    slow_query_threshold: float = 0,
+    slow_query_explain: bool = False,
+    slow_query_readers: Optional[List[str]] = None,
 ) -> FastAPI:
+    from app.access_log import AccessLogMiddleware, access_log
+    from app.catalog import name_catalog
+    from app.conditional import names_cache_policy
+    from app.serialization import name_encoder
+    from app.streaming import body_reader
+    from app.database import SessionLocal, engine, slow_query_log
+    from app.metrics import MetricsMiddleware, instrument_engine
     from app.routers import games, health, me, names, users
-    from fastapi import FastAPI, Request, status
+    from fastapi import FastAPI
     
     app = FastAPI(
         title='Prenoms',
@@ -31,32 +50,46 @@ def get_app(
         root_path=app_prefix,
     )
 
-    configure_auth(RemoteAuth, header_name=auth_header)
+    configure_auth(RemoteAuth, header_name=auth_header, cache_size=auth_cache_size, cache_ttl=auth_cache_ttl)
 
     logger.debug('Creating application with following parameters: production=%s ; debug=%s ; app_prefix=%s', production, debug, app_prefix)
 
+    name_catalog.check_interval = name_catalog_check_interval
+    name_encoder.enabled = fast_json
+    names_cache_policy.max_age = names_cache_max_age
+    body_reader.max_size = body_max_size
+    slow_query_log.threshold = slow_query_threshold
+
+    # EXPLAIN ANALYZE executes the slow statements a second time
+    slow_query_log.explain = slow_query_explain and not production
+    slow_query_log.readers = set(slow_query_readers or [])
+
+    @app.on_event('startup')
+    def load_name_catalog():
+        db = SessionLocal()
+
+        try:
+            name_catalog.snapshot(db)
+        except Exception:
+            logger.exception('Unable to load the name catalog, it will be loaded on first use')
+        finally:
+            db.close()
+
     if production:
-        access_logger = logging.getLogger(__name__)
-        re_status = re.compile('^HTTP_[0-9]+_(.+)$')
-        status_strings = { 
-            v: re_status.match(k).group(1).replace('_', ' ') for k, v in status.__dict__.items() if k.startswith('HTTP_')
-        }
-
-        @app.middleware('http')
-        async def access_log(request: Request, call_next):
-            response = await call_next(request)
-
-            access_logger.info(
-                '%s - "%s %s %s" %d %s',
-                request.headers.get('x-forwarded-for', request.client.host),
-                request.method,
-                request.url,
-                'HTTP/{}'.format(request.scope['http_version']),
-                response.status_code,
-                status_strings.get(response.status_code, '')
-            )
-
-            return response
+        access_log.default_sample_rate = access_log_sample_rate
+        access_log.sampling = access_log_sampling or {}
+        instrument_engine(engine)
+
+        @app.on_event('startup')
+        def start_access_log():
+            access_log.start()
+
+        @app.on_event('shutdown')
+        def stop_access_log():
+            access_log.stop()
+
+        # Routes are looked up when requests are logged, once all the routers are included
+        app.add_middleware(AccessLogMiddleware, routes=app.routes)
 
     app.include_router(games.router, prefix='/games')
     app.include_router(health.router, prefix='/health')
@@ -64,4 +97,11 @@ def get_app(
     app.include_router(names.router, prefix='/names')
     app.include_router(users.router, prefix='/users')
 
+    if metrics:
+        from app.routers import metrics as metrics_router
+
+        instrument_engine(engine)
+        app.include_router(metrics_router.router, prefix='/metrics')
+        app.add_middleware(MetricsMiddleware, routes=app.routes)
+
     return app
@@ -0,0 +1,157 @@
+import json
+import logging
+import queue
+import random
+import sys
+import time
+
+from app.metrics import collect_request_stats, get_route_path
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, Dict, List, Optional
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Format the access log records as one JSON object per line
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            **getattr(record, 'access', {}),
+        })
+
+
+class AccessLog:
+    """
+    Structured access log written by a background thread
+
+    Records are put in a queue by the request handlers and formatted and written by a
+    queue listener, so the event loop never waits on the log output. Routes can be
+    sampled, keyed by their templated path: only this fraction of their successful
+    requests is logged, while errors are always logged.
+    """
+    def __init__(self, name: str = 'app.access'):
+        self.default_sample_rate = 1.0
+        self.sampling: Dict[str, float] = {}
+        self._logger = logging.getLogger(name)
+        self._logger.propagate = False
+        self._queue = queue.SimpleQueue()
+        self._listener: Optional[QueueListener] = None
+
+    def start(self, handler: Optional[logging.Handler] = None) -> None:
+        """
+        Start writing the records, to the standard output by default
+        """
+        if self._listener is not None:
+            return
+
+        if handler is None:
+            handler = logging.StreamHandler(sys.stdout)
+
+        handler.setFormatter(JSONFormatter())
+
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(QueueHandler(self._queue))
+        self._listener = QueueListener(self._queue, handler)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """
+        Write the pending records and stop the background thread
+        """
+        if self._listener is None:
+            return
+
+        self._listener.stop()
+        self._listener = None
+
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
+
+    def get_sample_rate(self, route: Optional[str]) -> float:
+        """
+        Get the fraction of the requests of a route which are logged
+        """
+        return self.sampling.get(route, self.default_sample_rate)
+
+    def log(self, fields: Dict[str, Any]) -> None:
+        """
+        Log a request
+        """
+        self._logger.info('%s %s', fields['method'], fields['path'], extra={'access': fields})
+
+
+access_log = AccessLog()
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """
+    Parse route sample rates from a comma separated list of "path=rate"
+    """
+    sampling = {}
+
+    for item in value.split(','):
+        if item.strip():
+            path, rate = item.rsplit('=', 1)
+            sampling[path.strip()] = float(rate)
+
+    return sampling
+
+
+class AccessLogMiddleware:
+    """
+    Log the requests with their duration, SQL statements, user and game
+    """
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute]) -> None:
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+
+            await send(message)
+
+        # Shared with the request, so the authentication can identify the user
+        state = scope.setdefault('state', {})
+        start = time.perf_counter()
+
+        with collect_request_stats(scope) as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                duration = time.perf_counter() - start
+                route = get_route_path(self.routes, scope)
+                sample_rate = 1.0 if status_code >= 400 else access_log.get_sample_rate(route)
+
+                if sample_rate >= 1 or random.random() < sample_rate:
+                    headers = dict(scope['headers'])
+                    client = scope.get('client')
+
+                    access_log.log({
+                        'remote_addr': headers.get(b'x-forwarded-for', b'').decode('latin-1') or (client[0] if client else None),
+                        'method': scope['method'],
+                        'path': scope['path'],
+                        'query': scope['query_string'].decode('latin-1'),
+                        'route': route,
+                        'http_version': scope['http_version'],
+                        'status': status_code,
+                        'duration_ms': round(duration * 1000, 3),
+                        'db_time_ms': round(stats.db_time * 1000, 3),
+                        'db_statements': stats.statements,
+                        'user': state.get('user'),
+                        'game_id': scope.get('path_params', {}).get('game_id'),
+                        'sample_rate': sample_rate,
+                    })
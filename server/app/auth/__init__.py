@@ -36,6 +36,12 @@ class BaseAuth:
         """
         raise NotImplementedError()
 
+    def invalidate_user(self, username: str) -> None:
+        """
+        Forget any cached state about a user
+        """
+        pass
+
     def raise_auth_exception(self, headers={}) -> None:
         """
         Raise HTTPException
@@ -63,6 +69,14 @@ def get_auth() -> BaseAuth:
     return _auth_instance
 
 
+def invalidate_user(username: str) -> None:
+    """
+    Forget any cached state about a user in the current authentication instance
+    """
+    if _auth_instance is not None:
+        _auth_instance.invalidate_user(username)
+
+
 def get_user(
     request: Request,
     auth: BaseAuth = Depends(get_auth),
@@ -71,4 +85,9 @@ def get_user(
     """
     Get the user instance of the request
     """
-    return auth.get_user(request, db)
+    user = auth.get_user(request, db)
+
+    # Identify the user in the access log
+    request.state.user = user.username
+
+    return user
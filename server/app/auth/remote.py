@@ -1,14 +1,29 @@
 from app.auth import BaseAuth
+from app.cache import TTLCache
 from app.controllers.users import UserController
+from app.metrics import AUTH_CACHE_LOOKUPS
 from app.models.users import User
 from fastapi import Request
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+
+# Methods which do not write: the user can be served from the cache
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
 
 class RemoteAuth(BaseAuth):
-    def __init__(self, header_name: str = 'X-Remote-Auth'):
+    """
+    Authenticate users from a header set by the reverse proxy, creating them on first use
+
+    Identities are cached for `cache_ttl` seconds. `invalidate_user` only evicts them from
+    the cache of the current process: with several workers, the others keep serving a
+    deleted user to read requests until the TTL expires. Writes always check the user in
+    the database, so they never reference a deleted user.
+    """
+    def __init__(self, header_name: str = 'X-Remote-Auth', cache_size: int = 1024, cache_ttl: float = 60):
         super().__init__()
         self._header_name = header_name.lower()
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
         self._logger.info('Authenticating users with the "%s" header', header_name)
 
     def get_user(self, request: Request, db: Session) -> User:
@@ -20,4 +35,38 @@ class RemoteAuth(BaseAuth):
         if not username:
             self.raise_auth_exception()
 
-        return UserController.get_or_create_user(db, username)
+        if request.method in SAFE_METHODS:
+            identity = self._cache.get(username)
+            AUTH_CACHE_LOOKUPS.labels('miss' if identity is None else 'hit').inc()
+        else:
+            identity = None
+            AUTH_CACHE_LOOKUPS.labels('bypass').inc()
+
+        if identity is None:
+            user = UserController.get_or_create_user(db, username)
+            identity = {
+                'id': user.id,
+                'username': user.username,
+                'created_at': user.created_at,
+                'updated_at': user.updated_at,
+            }
+            self._cache.set(username, identity)
+
+        # Detached instance: it is only used for its identity
+        user = User(**identity)
+        make_transient_to_detached(user)
+
+        return user
+
+    def invalidate_user(self, username: str) -> None:
+        """
+        Remove a user from the cache
+        """
+        self._cache.invalidate(username)
+
+    @property
+    def cache(self) -> TTLCache:
+        """
+        Get the user cache
+        """
+        return self._cache
@@ -0,0 +1,151 @@
+import datetime
+import logging
+import threading
+import time
+
+from app.models.names import Name, name_catalog_version
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import NoResultFound
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogName(NamedTuple):
+    """
+    Name of the catalog
+    """
+    id: UUID
+    value: str
+    gender: str
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class CatalogPartition(NamedTuple):
+    """
+    Names of the catalog, in database order, with their positions
+    """
+    names: Tuple[CatalogName, ...]
+    positions: Dict[UUID, int]
+
+
+class CatalogSnapshot:
+    """
+    Immutable copy of the name table at a given version
+    """
+    def __init__(self, version: int, names: List[CatalogName]):
+        self.version = version
+        self._exclusion_masks = {}
+        self.partitions = {
+            gender: CatalogPartition(
+                names=tuple(partition),
+                positions={name.id: idx for idx, name in enumerate(partition)},
+            ) for gender, partition in [
+                (None, names),
+                ('M', [name for name in names if name.gender == 'M']),
+                ('F', [name for name in names if name.gender == 'F']),
+            ]
+        }
+
+    def __len__(self) -> int:
+        return len(self.partitions[None].names)
+
+    def list(self, gender: Optional[str] = None) -> Tuple[CatalogName, ...]:
+        """
+        Get the names, optionally restricted to a gender
+        """
+        return self.partitions[gender].names
+
+    def exclusion_mask(self, gender: Optional[str] = None) -> int:
+        """
+        Get the bitset of the positions of the names not matching a gender
+        """
+        if gender is None:
+            return 0
+
+        if gender not in self._exclusion_masks:
+            buffer = bytearray((len(self) + 7) // 8)
+
+            for position, name in enumerate(self.partitions[None].names):
+                if name.gender != gender:
+                    buffer[position >> 3] |= 1 << (position & 7)
+
+            self._exclusion_masks[gender] = int.from_bytes(buffer, 'little')
+
+        return self._exclusion_masks[gender]
+
+    def get(self, name_id: UUID) -> CatalogName:
+        """
+        Get a name by id
+        """
+        partition = self.partitions[None]
+
+        try:
+            return partition.names[partition.positions[name_id]]
+        except KeyError:
+            raise NoResultFound()
+
+
+class NameCatalog:
+    """
+    Process-level copy of the name table
+
+    The name table is reference data: it is loaded once and reloaded only when the version
+    maintained by a trigger on the table changes. The version is checked at most once per
+    `check_interval` seconds, so writes made by other processes are seen after that delay.
+    """
+    def __init__(self, check_interval: float = 0):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        """
+        Get an up-to-date snapshot of the catalog
+        """
+        snapshot = self._snapshot
+
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            version = db.query(name_catalog_version.c.version).scalar()
+
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = self.load(db, version)
+
+            self._checked_at = time.monotonic()
+
+            return self._snapshot
+
+    def load(self, db: Session, version: int) -> CatalogSnapshot:
+        """
+        Load the names from the database
+        """
+        q = db.query(Name.id, Name.value, Name.gender, Name.created_at, Name.updated_at)
+        q = q.order_by(Name.value.asc(), Name.id.asc())
+
+        snapshot = CatalogSnapshot(version, list(CatalogName(*row) for row in q))
+        logger.info('Loaded %d names in the catalog (version %s)', len(snapshot), version)
+
+        return snapshot
+
+    @property
+    def current(self) -> Optional[CatalogSnapshot]:
+        """
+        Get the last loaded snapshot, without checking its version
+        """
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        """
+        Force a version check on next access
+        """
+        self._checked_at = float('-inf')
+
+
+name_catalog = NameCatalog()
@@ -0,0 +1,54 @@
+import hashlib
+
+from fastapi import Request
+from typing import Any
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a strong entity tag from the values the representation depends on
+    """
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the If-None-Match header of a request matches an entity tag
+
+    Uses the weak comparison required for If-None-Match: nginx turns strong entity tags into
+    weak ones when it compresses a response, and clients send them back as is.
+    """
+    header = request.headers.get('if-none-match')
+
+    if not header:
+        return False
+
+    if header.strip() == '*':
+        return True
+
+    return any(
+        candidate.strip().removeprefix('W/') == etag for candidate in header.split(',')
+    )
+
+
+class CachePolicy:
+    """
+    Cache-Control policy of a cacheable resource
+
+    Responses depend on the authentication, so they may only be stored by the client. With a
+    zero max age, clients revalidate on each use, which costs a 304 when nothing changed.
+    """
+    def __init__(self, max_age: int = 0):
+        self.max_age = max_age
+
+    @property
+    def cache_control(self) -> str:
+        if self.max_age > 0:
+            return f'private, max-age={self.max_age}'
+
+        return 'private, no-cache'
+
+
+names_cache_policy = CachePolicy()
@@ -1,13 +1,19 @@
 import logging
 
+from app.catalog import CatalogName, name_catalog
+from app.controllers.names import NameController
 from app.exceptions import AlreadyExists
-from app.models.games import Game, GameGuest, GameFirstStage
+from app.models.games import Game, GameGuest, GameFirstStage, game_name_tally
 from app.models.names import Name
 from app.models.users import User
-from app.schemas.games import GameCreate, GameUpdate, GameFirstStageCreate
-from sqlalchemy import func, or_
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from app.schemas.games import GameCreate, GameUpdate, GameFirstStageCreate, GameFirstStageBatchResult, GameFirstStageBatchStatus
+from app.votes import vote_tracker
+from datetime import datetime
+from sqlalchemy import exists, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, joinedload
+from typing import Iterable, List, Optional, Tuple
 from uuid import UUID
 
 
@@ -16,8 +22,11 @@ logger = logging.getLogger(__name__)
 
 class GameController:
     @classmethod
-    def get_games(cls, db: Session, user: Optional[User] = None) -> List[Game]:
-        q = db.query(Game).order_by(Game.created_at.asc())
+    def get_games(cls, db: Session, user: Optional[User] = None, limit: Optional[int] = None, after: Optional[Tuple[datetime, UUID]] = None) -> List[Game]:
+        q = db.query(Game).options(joinedload(Game.owner)).order_by(Game.created_at.asc(), Game.id.asc())
+
+        if after:
+            q = q.filter(tuple_(Game.created_at, Game.id) > tuple_(*after))
 
         if user:
             q = q.filter(
@@ -30,24 +39,78 @@ class GameController:
                 )
             )
 
+        if limit is not None:
+            q = q.limit(limit)
+
         return q.all()
 
     @classmethod
     def get_game(cls, db: Session, game_id: UUID, user: Optional[User] = None) -> Game:
-        q = db.query(Game).filter(Game.id == game_id)
+        if cls._has_game_access(db, game_id, user):
+            game = db.get(Game, game_id, options=[joinedload(Game.owner)])
+
+            if game:
+                return game
+
+        q = db.query(Game).options(joinedload(Game.owner)).filter(Game.id == game_id)
 
         if user:
-            q = q.filter(
-                or_(
-                    # When user is the owner
-                    Game.owner_id == user.id,
+            q = q.filter(cls._is_member(game_id, user))
 
-                    # When user is a guest
-                    Game.id.in_(db.query(GameGuest.game_id).filter(GameGuest.user_id == user.id))
-                )
-            )
+        game = q.one()
+        cls._add_game_access(db, game_id, user)
+
+        return game
+
+    @classmethod
+    def _reload_game(cls, db: Session, game_id: UUID) -> Game:
+        """
+        Reload a game expired by a commit along with its owner, in a single query
+        """
+        q = db.query(Game).options(joinedload(Game.owner)).populate_existing()
+
+        return q.filter(Game.id == game_id).one()
+
+    @classmethod
+    def check_game_access(cls, db: Session, game_id: UUID, user: Optional[User] = None) -> None:
+        """
+        Check that the game exists and that the user is one of its members
+
+        The result is memoized in the session, which lives as long as the request.
+        """
+        if cls._has_game_access(db, game_id, user):
+            return
 
-        return q.one()
+        q = db.query(Game.id).filter(Game.id == game_id)
+
+        if user:
+            q = q.filter(cls._is_member(game_id, user))
+
+        q.one()
+        cls._add_game_access(db, game_id, user)
+
+    @classmethod
+    def _is_member(cls, game_id: UUID, user: User):
+        return or_(
+            # When user is the owner
+            Game.owner_id == user.id,
+
+            # When user is a guest
+            exists().where(GameGuest.game_id == game_id, GameGuest.user_id == user.id)
+        )
+
+    @classmethod
+    def _has_game_access(cls, db: Session, game_id: UUID, user: Optional[User]) -> bool:
+        return (game_id, user.id if user else None) in db.info.get('game_access', ())
+
+    @classmethod
+    def _add_game_access(cls, db: Session, game_id: UUID, user: Optional[User]) -> None:
+        db.info.setdefault('game_access', set()).add((game_id, user.id if user else None))
+
+    @classmethod
+    def _clear_game_access(cls, db: Session, game_id: UUID, user_id: Optional[UUID] = None) -> None:
+        access = db.info.get('game_access', set())
+        access.difference_update(set(key for key in access if key[0] == game_id and user_id in (None, key[1])))
 
     @classmethod
     def create_game(cls, db: Session, payload: GameCreate, user: User) -> Game:
@@ -57,9 +120,13 @@ class GameController:
         game.gender = payload.gender
         
         db.add(game)
+        db.flush()
+
+        # Keep the id, the instance is expired by the commit
+        game_id = game.id
         db.commit()
 
-        return game
+        return cls._reload_game(db, game_id)
 
     @classmethod
     def update_game(cls, db: Session, game_id: UUID, payload: GameUpdate, user: Optional[User] = None) -> Game:
@@ -69,7 +136,7 @@ class GameController:
 
         db.commit()
 
-        return game
+        return cls._reload_game(db, game_id)
 
     @classmethod
     def delete_game(cls, db: Session, game_id: UUID, user: Optional[User] = None) -> None:
@@ -79,32 +146,21 @@ class GameController:
         db.delete(game)
         db.commit()
 
+        cls._clear_game_access(db, game_id)
+
     @classmethod
     def get_game_guests(cls, db: Session, game_id: UUID, user: Optional[User] = None) -> List[User]:
-        game = cls.get_game(db, game_id, user)
+        cls.check_game_access(db, game_id, user)
 
         q = db.query(User)
         q = q.join(GameGuest).filter(GameGuest.game_id == game_id)
-
-        if user:
-            q = q.join(Game)
-            q = q.filter(
-                or_(
-                    # When user is the owner
-                    Game.owner_id == user.id,
-
-                    # When user is a guest
-                    Game.id.in_(db.query(GameGuest.game_id).filter(GameGuest.user_id == user.id))
-                )
-            )
-
         q = q.order_by(User.username.asc())
 
         return q.all()
 
     @classmethod
     def create_game_guest(cls, db: Session, game_id: UUID, user_id: UUID, user: Optional[User] = None) -> List[User]:
-        cls.get_game(db, game_id, user)
+        cls.check_game_access(db, game_id, user)
 
         if db.query(GameGuest).filter(GameGuest.game_id == game_id, GameGuest.user_id == user_id).first():
             raise AlreadyExists(['user_id', 'game_id'], [user_id, game_id])
@@ -120,7 +176,7 @@ class GameController:
 
     @classmethod
     def delete_game_guest(cls, db: Session, game_id: UUID, user_id: UUID, user: Optional[User] = None) -> List[User]:
-        cls.get_game(db, game_id, user)
+        cls.check_game_access(db, game_id, user)
 
         guest = db.query(GameGuest).filter(GameGuest.game_id == game_id, GameGuest.user_id == user_id).first()
 
@@ -128,11 +184,13 @@ class GameController:
             db.delete(guest)
             db.commit()
 
+            cls._clear_game_access(db, game_id, user_id)
+
         return cls.get_game_guests(db, game_id, user)
 
     @classmethod
     def create_first_stage(cls, db: Session, game_id: UUID, payload: GameFirstStageCreate, user: User) -> GameFirstStage:
-        cls.get_game(db, game_id, user)
+        cls.check_game_access(db, game_id, user)
 
         if db.query(GameFirstStage).filter(GameFirstStage.game_id == game_id, GameFirstStage.user_id == user.id, GameFirstStage.name_id == payload.name_id).first():
             raise AlreadyExists(['name_id', 'user_id', 'game_id'], [payload.name_id, user.id, game_id])
@@ -144,35 +202,149 @@ class GameController:
         choice.choice = payload.choice
 
         db.add(choice)
+        db.flush()
+
+        # Keep the id, the instance is expired by the commit
+        choice_id = choice.id
         db.commit()
 
-        return choice
+        if name_catalog.current:
+            vote_tracker.add(game_id, user.id, [payload.name_id], name_catalog.current)
+
+        # Reload the choice and everything the response nests in a single query
+        q = db.query(GameFirstStage).populate_existing()
+        q = q.options(
+            joinedload(GameFirstStage.game).joinedload(Game.owner),
+            joinedload(GameFirstStage.user),
+            joinedload(GameFirstStage.name),
+        )
+
+        return q.filter(GameFirstStage.id == choice_id).one()
 
     @classmethod
-    def get_first_stage_next(cls, db: Session, game_id: UUID, user: User) -> Name:
-        game = cls.get_game(db, game_id, user)
+    def create_first_stages(cls, db: Session, game_id: UUID, payloads: List[GameFirstStageCreate], user: User) -> List[GameFirstStageBatchResult]:
+        """
+        Create several choices for the first stage with a single insert
+        """
+        cls.check_game_access(db, game_id, user)
+
+        name_ids = set(payload.name_id for payload in payloads)
+        known_ids = set(name_id for name_id, in db.query(Name.id).filter(Name.id.in_(name_ids)))
+
+        # Keep the first choice of each known name
+        rows = {}
+        for payload in payloads:
+            if payload.name_id in known_ids and payload.name_id not in rows:
+                rows[payload.name_id] = {
+                    'game_id': game_id,
+                    'user_id': user.id,
+                    'name_id': payload.name_id,
+                    'choice': payload.choice,
+                }
+
+        created_ids = set()
+
+        if rows:
+            q = insert(GameFirstStage).values(list(rows.values()))
+            q = q.on_conflict_do_nothing(index_elements=[GameFirstStage.game_id, GameFirstStage.user_id, GameFirstStage.name_id])
+            q = q.returning(GameFirstStage.name_id)
+
+            created_ids = set(name_id for name_id, in db.execute(q))
+            db.commit()
 
-        q = db.query(Name)
+            if name_catalog.current:
+                vote_tracker.add(game_id, user.id, created_ids, name_catalog.current)
 
-        # Add a gender restriction if defined in the game
-        if game.gender:
-            q = q.filter(Name.gender == game.gender)
+        results = []
+        for payload in payloads:
+            if payload.name_id not in known_ids:
+                status = GameFirstStageBatchStatus.unknown_name
+            elif payload.name_id in created_ids:
+                status = GameFirstStageBatchStatus.created
+                created_ids.remove(payload.name_id)
+            else:
+                status = GameFirstStageBatchStatus.already_exists
 
-        # Exclude names already processed by the user
-        q = q.filter(Name.id.notin_(
-            db.query(GameFirstStage.name_id).filter(GameFirstStage.game_id == game.id, GameFirstStage.user_id == user.id))
+            results.append(GameFirstStageBatchResult(name_id=payload.name_id, status=status))
+
+        return results
+
+    @classmethod
+    def iter_first_stage_votes(cls, db: Session, game_id: UUID, user: Optional[User] = None, batch_size: int = 1000) -> Iterable[Row]:
+        """
+        Iterate over the choices made in the first stage of a game, with a server-side cursor
+
+        Access is checked on call, the choices are fetched by batches while iterating.
+        """
+        cls.check_game_access(db, game_id, user)
+
+        q = db.query(
+            GameFirstStage.id,
+            GameFirstStage.created_at,
+            GameFirstStage.updated_at,
+            GameFirstStage.user_id,
+            GameFirstStage.name_id,
+            GameFirstStage.choice,
         )
+        q = q.filter(GameFirstStage.game_id == game_id)
+        q = q.order_by(GameFirstStage.created_at.asc(), GameFirstStage.id.asc())
+
+        return q.yield_per(batch_size)
+
+    @classmethod
+    def get_first_stage_next(cls, db: Session, game_id: UUID, user: User) -> Optional[CatalogName]:
+        names = cls.get_first_stage_next_names(db, game_id, user, 1)
+
+        return names[0] if names else None
+
+    @classmethod
+    def get_first_stage_next_names(cls, db: Session, game_id: UUID, user: User, count: int, after: Optional[Tuple[str, UUID]] = None) -> List[CatalogName]:
+        """
+        Get the next names to vote for, ordered by value then id
+
+        The `after` key (value, id) allows clients to fetch the names following the ones
+        they already have in their buffer.
+        """
+        game = cls.get_game(db, game_id, user)
+        snapshot = name_catalog.snapshot(db)
+
+        # Start after the last name known by the client
+        start = NameController.get_catalog_position_after(db, snapshot, after) if after else 0
 
-        return q.first()
+        # Exclude names already processed by the user
+        positions = vote_tracker.next_positions(db, snapshot, game.id, user.id, game.gender, start, count)
+        names = snapshot.list()
+
+        return list(names[position] for position in positions)
 
     @classmethod
-    def get_first_stage_result(cls, db: Session, game_id: UUID, user: User):
+    def get_first_stage_result(cls, db: Session, game_id: UUID, user: User) -> List[CatalogName]:
+        """
+        Get the names chosen by all the members of a game
+        """
         game = cls.get_game(db, game_id, user)
-        members_id = [game.owner_id] + list(member.id for member in cls.get_game_guests(db, game_id, user) if member.id != game.owner_id)
 
-        q = db.query(GameFirstStage.name_id)
-        q = q.filter(GameFirstStage.game_id == game.id, GameFirstStage.choice == True)
-        q = q.having(func.count(GameFirstStage.user_id) == len(members_id))
-        q = q.group_by(GameFirstStage.name_id)
+        # The owner and the guests
+        members_count = db.query(func.count(GameGuest.id)).filter(GameGuest.game_id == game.id, GameGuest.user_id != game.owner_id).scalar_subquery() + 1
+
+        q = db.query(Name.id, Name.value, Name.gender, Name.created_at, Name.updated_at)
+        q = q.join(game_name_tally, game_name_tally.c.name_id == Name.id)
+        q = q.filter(game_name_tally.c.game_id == game.id, game_name_tally.c.yes_count == members_count)
+
+        return list(CatalogName(*row) for row in q.order_by(Name.value))
+
+    @classmethod
+    def rebuild_first_stage_tally(cls, db: Session, game_id: Optional[UUID] = None) -> int:
+        """
+        Recompute the first stage tally of a game, or of every game, from the choices
+
+        Returns the number of games rebuilt.
+        """
+        game_ids = [game_id] if game_id else [row.id for row in db.query(Game.id)]
+
+        for id in game_ids:
+            db.execute(select(func.game_name_tally_rebuild(id)))
+
+        db.commit()
 
-        return db.query(Name).filter(Name.id.in_(q)).order_by(Name.value).all()
+        return len(game_ids)
@@ -1,7 +1,9 @@
 import logging
 
-from app.schemas.health import HealthStatus
+from app.database import get_pool_status, slow_query_log
+from app.schemas.health import HealthStatus, PoolStatus, SlowQuery
 from sqlalchemy.orm import Session
+from typing import List
 
 
 logger = logging.getLogger(__name__)
@@ -17,3 +19,17 @@ class HealthController:
             return HealthStatus.ok if db.query(1).scalar() == 1 else HealthStatus.error
         except:
             return HealthStatus.error
+
+    @classmethod
+    def pool_status(cls) -> PoolStatus:
+        """
+        Get the usage of the database connection pool
+        """
+        return PoolStatus(**get_pool_status())
+
+    @classmethod
+    def slow_queries(cls, limit: int = 10) -> List[SlowQuery]:
+        """
+        Get the slowest recorded statement fingerprints
+        """
+        return [SlowQuery.from_orm(query) for query in slow_query_log.top(limit)]
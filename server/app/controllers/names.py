@@ -1,29 +1,160 @@
+import csv
+import io
 import logging
+import unicodedata
 
+from app.catalog import CatalogName, CatalogSnapshot, name_catalog
 from app.exceptions import AlreadyExists
 from app.models.names import Name
-from app.schemas.names import NameCreate, NameGender
+from app.schemas.names import NameCreate, NameGender, NameImportResult
+from app.search import name_search
+from sqlalchemy import text, tuple_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm.exc import NoResultFound
+from typing import Iterable, List, Optional, Sequence, Tuple
 from uuid import UUID
 
 
 logger = logging.getLogger(__name__)
 
+# Size in characters of the CSV sent to the staging table by each COPY
+IMPORT_CHUNK_SIZE = 1024 * 1024
+
 
 class NameController:
     @classmethod
-    def get_names(cls, db: Session, gender: Optional[NameGender] = None) -> List[Name]:
-        q = db.query(Name).order_by(Name.value.asc())
+    def get_names(cls, db: Session, gender: Optional[NameGender] = None, limit: Optional[int] = None, after: Optional[Tuple[str, UUID]] = None, snapshot: Optional[CatalogSnapshot] = None) -> List[CatalogName]:
+        """
+        Get the names ordered by value then id, optionally starting after a (value, id) key
+
+        The names are read from `snapshot`, or from an up-to-date snapshot of the catalog.
+        """
+        snapshot = snapshot or name_catalog.snapshot(db)
+        names = snapshot.list(gender)
+
+        start = cls.get_catalog_position_after(db, snapshot, after, gender) if after else 0
+        end = start + limit if limit is not None else len(names)
+
+        return list(names[start:end])
+
+    @classmethod
+    def get_catalog_position_after(cls, db: Session, snapshot: CatalogSnapshot, after: Tuple[str, UUID], gender: Optional[NameGender] = None) -> int:
+        """
+        Get the position following a (value, id) key in a catalog partition
+        """
+        positions = snapshot.partitions[gender].positions
+
+        if after[1] in positions:
+            return positions[after[1]] + 1
+
+        # The name has been removed from the catalog: find the next one in database order
+        q = db.query(Name.id).filter(tuple_(Name.value, Name.id) > tuple_(*after))
 
         if gender:
             q = q.filter(Name.gender == gender)
 
-        return q.all()
+        q = q.order_by(Name.value.asc(), Name.id.asc())
+
+        for name_id, in q.limit(100):
+            if name_id in positions:
+                return positions[name_id]
+
+        return len(snapshot.list(gender))
 
     @classmethod
-    def get_name(cls, db: Session, name_id: UUID) -> Name:
-        return db.query(Name).filter(Name.id == name_id).one()
+    def import_names(cls, db: Session, lines: Iterable[str]) -> NameImportResult:
+        """
+        Import names from CSV lines of "value,gender", skipping the ones which already exist
+
+        Pairs are normalized and deduplicated while the lines are read, copied into a staging
+        table with COPY by chunks, then inserted with a single INSERT ... ON CONFLICT DO NOTHING.
+        """
+        read = invalid = 0
+        pairs = set()
+
+        db.execute(text('''
+            CREATE TEMPORARY TABLE "name_import" (
+                value VARCHAR NOT NULL,
+                gender name_gender_type NOT NULL
+            ) ON COMMIT DROP
+        '''))
+
+        # COPY is not supported by SQLAlchemy: it goes through the DBAPI cursor of the session
+        cursor = db.connection().connection.cursor()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def copy():
+            buffer.seek(0)
+            cursor.copy_expert('COPY "name_import" (value, gender) FROM STDIN WITH (FORMAT csv)', buffer)
+            buffer.seek(0)
+            buffer.truncate()
+
+        try:
+            for row in csv.reader(lines):
+                if not row:
+                    continue
+
+                read += 1
+                pair = cls.normalize_name(row)
+
+                if pair is None:
+                    invalid += 1
+                elif pair not in pairs:
+                    pairs.add(pair)
+                    writer.writerow(pair)
+
+                    if buffer.tell() >= IMPORT_CHUNK_SIZE:
+                        copy()
+
+            if buffer.tell():
+                copy()
+        finally:
+            cursor.close()
+
+        inserted = db.execute(text('''
+            INSERT INTO "name" (id, created_at, updated_at, value, gender)
+            SELECT uuid_generate_v4(), NOW(), NOW(), value, gender FROM "name_import"
+            ON CONFLICT (value, gender) DO NOTHING
+        ''')).rowcount
+
+        db.commit()
+        name_catalog.invalidate()
+
+        return NameImportResult(
+            read=read,
+            invalid=invalid,
+            duplicates=read - invalid - len(pairs),
+            inserted=inserted,
+            skipped=len(pairs) - inserted,
+        )
+
+    @staticmethod
+    def normalize_name(row: Sequence[str]) -> Optional[Tuple[str, str]]:
+        """
+        Normalize a (value, gender) CSV row, returning None when it is invalid
+        """
+        if len(row) != 2:
+            return None
+
+        value = ' '.join(unicodedata.normalize('NFC', row[0]).split())
+        gender = row[1].strip().upper()
+
+        if not value or gender not in NameGender.__members__:
+            return None
+
+        return value, gender
+
+    @classmethod
+    def search_names(cls, db: Session, query: str, gender: Optional[NameGender] = None, limit: int = 10, snapshot: Optional[CatalogSnapshot] = None) -> List[CatalogName]:
+        """
+        Search names by accent-insensitive prefix, then by similarity
+        """
+        return name_search.search(snapshot or name_catalog.snapshot(db), query, gender, limit)
+
+    @classmethod
+    def get_name(cls, db: Session, name_id: UUID) -> CatalogName:
+        return name_catalog.snapshot(db).get(name_id)
 
     @classmethod
     def create_name(cls, db: Session, payload: NameCreate) -> Name:
@@ -37,11 +168,15 @@ class NameController:
         db.add(name)
         db.commit()
 
+        name_catalog.invalidate()
+
         return name
 
     @classmethod
     def delete_name(cls, db: Session, name_id: UUID) -> None:
-        name = cls.get_name(db, name_id)
+        if not db.query(Name).filter(Name.id == name_id).delete():
+            raise NoResultFound()
 
-        db.delete(name)
         db.commit()
+
+        name_catalog.invalidate()
@@ -1,10 +1,11 @@
 import logging
 
+from app.auth import invalidate_user
 from app.models.users import User
 from app.schemas.users import UserCreate
-from sqlalchemy.orm import Session
-from sqlalchemy.orm.exc import NoResultFound
-from typing import List
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Query, Session, make_transient_to_detached
+from typing import Iterable, List, Optional
 from uuid import UUID
 
 
@@ -13,8 +14,27 @@ logger = logging.getLogger(__name__)
 
 class UserController:
     @classmethod
-    def get_users(cls, db: Session) -> List[User]:
-        return db.query(User).order_by(User.username.asc()).all()
+    def get_users(cls, db: Session, limit: Optional[int] = None, after: Optional[str] = None) -> List[User]:
+        return cls._query_users(db, limit, after).all()
+
+    @classmethod
+    def iter_users(cls, db: Session, limit: Optional[int] = None, after: Optional[str] = None, batch_size: int = 500) -> Iterable[User]:
+        """
+        Iterate over the users with a server-side cursor, fetching them by batches
+        """
+        return cls._query_users(db, limit, after).yield_per(batch_size)
+
+    @classmethod
+    def _query_users(cls, db: Session, limit: Optional[int], after: Optional[str]) -> Query:
+        q = db.query(User).order_by(User.username.asc())
+
+        if after is not None:
+            q = q.filter(User.username > after)
+
+        if limit is not None:
+            q = q.limit(limit)
+
+        return q
 
     @classmethod
     def get_user(cls, db: Session, user_id: UUID) -> User:
@@ -33,13 +53,30 @@ class UserController:
     @classmethod
     def delete_user(cls, db: Session, user_id: UUID) -> None:
         user = cls.get_user(db, user_id)
+        username = user.username
 
         db.delete(user)
         db.commit()
 
+        invalidate_user(username)
+
     @classmethod
     def get_or_create_user(cls, db: Session, username: str) -> User:
-        try:
-            return db.query(User).filter_by(username=username).one()
-        except NoResultFound:
-            return cls.create_user(db, UserCreate(username=username))
+        """
+        Get a user by username, creating it if needed, in a single statement
+
+        The no-op update on conflict makes RETURNING yield the existing row, so concurrent
+        calls for the same username all resolve to the same user.
+        """
+        q = insert(User).values(username=username)
+        q = q.on_conflict_do_update(index_elements=[User.username], set_={'username': q.excluded.username})
+        q = q.returning(*User.__table__.columns)
+
+        row = db.execute(q).mappings().one()
+        db.commit()
+
+        # Build the instance from the returned row: the commit would expire a persistent one
+        user = User(**row)
+        make_transient_to_detached(user)
+
+        return user
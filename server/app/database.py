@@ -1,7 +1,30 @@
+import hashlib
+import logging
 import os
+import re
+import sys
+import threading
+import time
 
-from sqlalchemy import create_engine
+from app.metrics import DB_POOL_CHECKOUT_WAIT, get_request_stats
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, Dict, Iterable, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+re_placeholder = re.compile(r"%\(\w+\)s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+re_placeholder_list = re.compile(r'\?(?:\s*,\s*\?)+')
+re_whitespace = re.compile(r'\s+')
+re_locking_clause = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b', re.IGNORECASE)
+re_call = re.compile(r'\b(\w+)\s*\(')
+
+# Aggregates and keywords followed by a parenthesis: any other call may have side effects
+ANALYZE_SAFE_CALLS = {
+    'count', 'sum', 'min', 'max', 'avg', 'coalesce', 'lower', 'upper',
+    'and', 'any', 'as', 'exists', 'in', 'not', 'or', 'values',
+}
 
 
 def get_url() -> str:
@@ -16,11 +39,85 @@ def get_url() -> str:
     )
 
 
+def get_engine_options() -> Dict[str, Any]:
+    """
+    Return the engine and connection pool options from the environment
+    """
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '-1')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'false').lower() == 'true',
+    }
+
+    # Global connection budget shared by the worker processes of the server
+    max_connections = int(os.getenv('DB_MAX_CONNECTIONS', '0'))
+
+    if max_connections > 0:
+        per_worker = max(1, max_connections // max(1, int(os.getenv('APP_WORKERS', '1'))))
+        options['pool_size'] = min(options['pool_size'], per_worker)
+        options['max_overflow'] = min(options['max_overflow'], per_worker - options['pool_size'])
+
+    # Server-side statement timeout, in milliseconds
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT', '0'))
+
+    if statement_timeout > 0:
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={statement_timeout}',
+        }
+
+    return options
+
+
+def get_pool_status() -> Dict[str, int]:
+    """
+    Return the usage of the connection pool
+    """
+    return {
+        'size': engine.pool.size(),
+        'max_overflow': engine_options['max_overflow'],
+        'checked_in': engine.pool.checkedin(),
+        'checked_out': engine.pool.checkedout(),
+        'overflow': engine.pool.overflow(),
+    }
+
+
+class RequestSession(Session):
+    """
+    Session holding a single pooled connection, from its first statement until it is closed
+
+    Commits do not give the connection back to the pool, and requests which do not execute
+    any statement, like the ones served from the catalog, never check one out.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._connection = None
+
+    def get_bind(self, *args, **kwargs):
+        if self._connection is None:
+            start = time.perf_counter()
+            self._connection = engine.connect()
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+        return self._connection
+
+    def close(self) -> None:
+        super().close()
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
 def get_session() -> Session:
     """
     Create a new database session
+
+    FastAPI caches this dependency per request: the route and the authentication share
+    the same session, and so the same connection.
     """
-    db = SessionLocal()
+    db = RequestSessionLocal()
 
     try:
         yield db
@@ -28,6 +125,187 @@ def get_session() -> Session:
         db.close()
 
 
-engine = create_engine(get_url())
+engine_options = get_engine_options()
+engine = create_engine(get_url(), **engine_options)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+RequestSessionLocal = sessionmaker(class_=RequestSession, autocommit=False, autoflush=False)
+
+
+def fingerprint_statement(statement: str) -> str:
+    """
+    Normalize a statement so its executions with different parameters are grouped together
+    """
+    statement = re_placeholder.sub('?', statement)
+    statement = re_placeholder_list.sub('...', statement)
+
+    return re_whitespace.sub(' ', statement).strip()
+
+
+def get_statement_origin() -> Optional[str]:
+    """
+    Get the application function which executed the current statement, usually a controller method
+    """
+    frame = sys._getframe(1)
+    origin = None
+
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+
+        if module.startswith('app.') and module != __name__:
+            owner = type(frame.f_locals['self']) if 'self' in frame.f_locals else frame.f_locals.get('cls')
+            name = f'{owner.__name__}.{frame.f_code.co_name}' if owner else frame.f_code.co_name
+            origin = f'{module}.{name}'
+
+            # Controllers are called by the routers, the closest one is the most relevant
+            if module.startswith('app.controllers.'):
+                return origin
+
+        frame = frame.f_back
+
+    return origin
+
+
+class SlowQuery:
+    """
+    Executions of a statement fingerprint slower than the threshold
+    """
+    def __init__(self, fingerprint: str):
+        self.id = hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.statement = None
+        self.route = None
+        self.origin = None
+        self.plan = None
+
+
+class SlowQueryLog:
+    """
+    Record the statements slower than a threshold, in milliseconds, grouped by fingerprint
+
+    When `explain` is set, the plan of the slowest execution of each SELECT fingerprint is
+    captured. EXPLAIN (ANALYZE, BUFFERS) runs the statement again, in a savepoint which is
+    always rolled back, and only for statements which neither lock rows, call functions nor
+    stream their rows: the others get a plain EXPLAIN. It should not be enabled in production.
+
+    The recorded statements are only readable by the usernames of `readers`.
+    """
+    def __init__(self, threshold: float = 0, explain: bool = False, maxsize: int = 1000, readers: Iterable[str] = ()):
+        self.threshold = threshold
+        self.explain = explain
+        self.maxsize = maxsize
+        self.readers = set(readers)
+        self._queries: Dict[str, SlowQuery] = {}
+        self._lock = threading.Lock()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, which is discarded with the statement even when it fails
+        if self.threshold > 0 and context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_slow_query_start', None)
+
+        if self.threshold <= 0 or start is None:
+            return
+
+        duration = (time.perf_counter() - start) * 1000
+
+        if duration < self.threshold:
+            return
+
+        stats = get_request_stats()
+        route = stats.route if stats is not None else None
+        origin = get_statement_origin()
+        plan = None
+
+        logger.warning('Slow query (%.1f ms) from %s on %s: %s', duration, origin, route, statement)
+
+        if self.explain and not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+            plan = self.get_plan(conn.connection, statement, parameters, analyze=self.can_analyze(statement, context))
+
+        self.record(statement, duration, route, origin, plan)
+
+    @staticmethod
+    def can_analyze(statement: str, context: Any) -> bool:
+        """
+        Whether a SELECT statement can be run again by EXPLAIN ANALYZE without locking rows,
+        calling functions which may write, or reading a whole table for a streamed export
+        """
+        if context is not None and context.execution_options.get('stream_results'):
+            return False
+
+        if re_locking_clause.search(statement):
+            return False
+
+        return all(name.lower() in ANALYZE_SAFE_CALLS for name in re_call.findall(statement))
+
+    def get_plan(self, dbapi_connection, statement: str, parameters: Any, analyze: bool = True) -> Optional[str]:
+        """
+        Get the execution plan of a statement, in a savepoint undoing whatever it did when run again
+        """
+        cursor = dbapi_connection.cursor()
+
+        try:
+            cursor.execute('SAVEPOINT slow_query_explain')
+
+            try:
+                cursor.execute(f'EXPLAIN {"(ANALYZE, BUFFERS) " if analyze else ""}{statement}', parameters)
+                return '\n'.join(row[0] for row in cursor.fetchall())
+            except Exception:
+                logger.exception('Unable to explain the slow query')
+                return None
+            finally:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        finally:
+            cursor.close()
+
+    def record(self, statement: str, duration: float, route: Optional[str] = None, origin: Optional[str] = None, plan: Optional[str] = None) -> None:
+        """
+        Record a slow execution of a statement
+        """
+        fingerprint = fingerprint_statement(statement)
+
+        with self._lock:
+            query = self._queries.get(fingerprint)
+
+            if query is None:
+                # Forget the fastest fingerprint when full
+                if len(self._queries) >= self.maxsize:
+                    del self._queries[min(self._queries.values(), key=lambda q: q.max_time).fingerprint]
+
+                query = self._queries[fingerprint] = SlowQuery(fingerprint)
+
+            query.count += 1
+            query.total_time += duration
+
+            if duration >= query.max_time:
+                query.max_time = duration
+                query.statement = statement
+                query.route = route
+                query.origin = origin
+                query.plan = plan or query.plan
+
+    def top(self, limit: int = 10) -> List[SlowQuery]:
+        """
+        Get the slowest fingerprints
+        """
+        with self._lock:
+            return sorted(self._queries.values(), key=lambda q: q.max_time, reverse=True)[:limit]
+
+    def clear(self) -> None:
+        """
+        Forget the recorded statements
+        """
+        with self._lock:
+            self._queries.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+event.listen(engine, 'before_cursor_execute', slow_query_log.before_cursor_execute)
+event.listen(engine, 'after_cursor_execute', slow_query_log.after_cursor_execute)
@@ -5,3 +5,13 @@ class AlreadyExists(Exception):
     def __init__(self, fields: List[str], values: List[Any]):
         self.fields = fields
         self.values = values
+
+
+class InvalidCursor(Exception):
+    def __init__(self, cursor: str):
+        self.cursor = cursor
+
+
+class BodyTooLarge(Exception):
+    def __init__(self, max_size: int):
+        self.max_size = max_size
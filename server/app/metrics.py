@@ -0,0 +1,217 @@
+import os
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Iterator, List, Optional, Tuple
+
+
+# Label of the requests which did not match any route, so scanners do not create new series
+UNMATCHED_ROUTE = '<unmatched>'
+
+# Buckets for the durations of SQL statements and pool checkouts, which are much shorter than requests
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUESTS = Counter(
+    'http_requests_total', 'Number of HTTP requests',
+    ['method', 'route', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Duration of HTTP requests, including the response body',
+    ['method', 'route'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Number of HTTP requests being processed',
+    ['method'], multiprocess_mode='livesum',
+)
+DB_STATEMENTS = Counter(
+    'db_statements_total', 'Number of SQL statements executed',
+    ['route'],
+)
+DB_STATEMENT_DURATION = Histogram(
+    'db_statement_duration_seconds', 'Duration of SQL statements',
+    ['route'], buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a connection from the pool',
+    buckets=DB_BUCKETS,
+)
+AUTH_CACHE_LOOKUPS = Counter(
+    'auth_cache_lookups_total', 'Users authenticated from the cache (hit), the database (miss), or the database because of a write (bypass)',
+    ['result'],
+)
+
+
+class RequestStats:
+    """
+    SQL statements executed while processing a request
+    """
+    def __init__(self, scope: Optional[Scope] = None):
+        self.scope = scope
+        self.durations: List[float] = []
+
+    @property
+    def route(self) -> Optional[str]:
+        """
+        Templated path of the route handling the request, once it has been routed
+        """
+        if self.scope is None or 'app' not in self.scope:
+            return None
+
+        return get_route_path(self.scope['app'].routes, self.scope)
+
+    @property
+    def statements(self) -> int:
+        return len(self.durations)
+
+    @property
+    def db_time(self) -> float:
+        return sum(self.durations)
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar('request_stats', default=None)
+
+
+def get_request_stats() -> Optional[RequestStats]:
+    """
+    Get the statistics of the request being processed, if any
+    """
+    return _request_stats.get()
+
+
+@contextmanager
+def collect_request_stats(scope: Optional[Scope] = None) -> Iterator[RequestStats]:
+    """
+    Collect the SQL statements of a request, sharing the statistics of an enclosing middleware
+    """
+    stats = _request_stats.get()
+
+    if stats is not None:
+        yield stats
+        return
+
+    stats = RequestStats(scope)
+    token = _request_stats.set(stats)
+
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is discarded with the statement even when it fails
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+
+    if start is None:
+        return
+
+    duration = time.perf_counter() - start
+    stats = _request_stats.get()
+
+    if stats is not None:
+        stats.durations.append(duration)
+    else:
+        # Statements executed outside of a request, like the catalog loading at startup
+        DB_STATEMENTS.labels('').inc()
+        DB_STATEMENT_DURATION.labels('').observe(duration)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Time the SQL statements executed by an engine
+    """
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def get_route_path(routes: List[BaseRoute], scope: Scope) -> Optional[str]:
+    """
+    Get the templated path of the route which handled a request
+    """
+    endpoint = scope.get('endpoint')
+
+    if endpoint is None:
+        return None
+
+    for route in routes:
+        if getattr(route, 'endpoint', None) is endpoint:
+            return route.path
+
+    return None
+
+
+def generate_metrics() -> Tuple[bytes, str]:
+    """
+    Return the metrics in the Prometheus text format, with their content type
+
+    When PROMETHEUS_MULTIPROC_DIR is set, the metrics of all the worker processes are
+    aggregated from the files they write in this directory.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Measure the requests and the SQL statements they execute, labelled by route
+    """
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute]) -> None:
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+
+        with collect_request_stats(scope) as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                duration = time.perf_counter() - start
+                in_flight.dec()
+
+                route = get_route_path(self.routes, scope) or UNMATCHED_ROUTE
+
+                REQUESTS.labels(method, route, status_code).inc()
+                REQUEST_DURATION.labels(method, route).observe(duration)
+
+                if stats.durations:
+                    DB_STATEMENTS.labels(route).inc(stats.statements)
+                    statement_duration = DB_STATEMENT_DURATION.labels(route)
+
+                    for statement in stats.durations:
+                        statement_duration.observe(statement)
@@ -1,6 +1,6 @@
 from app.models import Base
 from app.models.names import GenderType
-from sqlalchemy import Boolean, Column, ForeignKey, String, UniqueConstraint
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 
@@ -9,6 +9,9 @@ class Game(Base):
     Game model
     """
     __tablename__ = 'game'
+    __table_args__ = (
+        Index('game_created_at_id_idx', 'created_at', 'id'),
+    )
 
     description = Column(String, nullable=True)
     gender = Column(GenderType, nullable=True)
@@ -52,3 +55,14 @@ class GameFirstStage(Base):
     name = relationship('Name', foreign_keys='GameFirstStage.name_id')
 
     choice = Column(Boolean, nullable=False, index=True)
+
+
+# Number of positive first stage choices per name made by the current members of a game,
+# maintained by triggers on game_first_stage and game_guest
+game_name_tally = Table(
+    'game_name_tally',
+    Base.metadata,
+    Column('game_id', ForeignKey('game.id', ondelete='CASCADE'), primary_key=True),
+    Column('name_id', ForeignKey('name.id', ondelete='CASCADE'), primary_key=True),
+    Column('yes_count', Integer, nullable=False),
+)
@@ -1,5 +1,5 @@
 from app.models import Base
-from sqlalchemy import Column, String, UniqueConstraint
+from sqlalchemy import BigInteger, Column, Index, Integer, String, Table, UniqueConstraint
 from sqlalchemy.dialects.postgresql import ENUM
 
 
@@ -13,7 +13,18 @@ class Name(Base):
     __tablename__ = 'name'
     __table_args__ = (
         UniqueConstraint('value', 'gender', name='name_value_gender_uc'),
+        Index('name_value_id_idx', 'value', 'id'),
+        Index('name_gender_value_id_idx', 'gender', 'value', 'id'),
     )
 
     value = Column(String, nullable=False)
     gender = Column(GenderType, index=True, nullable=False)
+
+
+# Version of the name table, bumped by a trigger on each write
+name_catalog_version = Table(
+    'name_catalog_version',
+    Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', BigInteger, nullable=False),
+)
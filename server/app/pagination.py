@@ -0,0 +1,46 @@
+import base64
+import json
+
+from app.exceptions import InvalidCursor
+from fastapi import HTTPException, status
+from typing import Any, Callable, List
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of a row as an opaque cursor
+    """
+    data = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, *types: Callable[[str], Any]) -> List[Any]:
+    """
+    Decode a cursor into the sort key of a row, converting each value with the given types
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data.decode('utf-8'))
+
+        if not isinstance(values, list) or len(values) != len(types) or not all(isinstance(value, str) for value in values):
+            raise ValueError('invalid sort key')
+
+        return [t(value) for t, value in zip(types, values)]
+    except ValueError:
+        raise InvalidCursor(cursor)
+
+
+def decode_cursor_or_422(cursor: str, *types: Callable[[str], Any]) -> List[Any]:
+    """
+    Decode the `after` query parameter of a route, answering 422 when it is not a valid cursor
+    """
+    try:
+        return decode_cursor(cursor, *types)
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=[
+            {
+                'loc': ['query', 'after'],
+                'msg': 'invalid cursor',
+                'type': 'value_error.cursor',
+            }
+        ])
@@ -1,15 +1,20 @@
 from app.auth import get_user
+from app.catalog import CatalogName, name_catalog
 from app.controllers.games import GameController
 from app.database import get_session
 from app.exceptions import AlreadyExists
 from app.models.users import User
-from app.schemas.games import Game, GameCreate, GameFirstStageCreate, GameUpdate, GameGuestCreate, GameFirstStage
+from app.pagination import decode_cursor_or_422, encode_cursor
+from app.schemas.games import Game, GameCreate, GameFirstStageCreate, GameUpdate, GameGuestCreate, GameFirstStage, GameFirstStageBatchResult, GameFirstStageVote
 from app.schemas.names import Name
 from app.schemas.users import User as UserSchema
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.serialization import JSONBytesResponse, name_encoder
+from app.streaming import stream_ndjson, wants_stream
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound
-from typing import List
+from typing import List, Optional, Union
 from uuid import UUID
 
 
@@ -17,18 +22,34 @@ router = APIRouter()
 
 
 @router.get('', response_model=List[Game])
-async def get_games(
+def get_games(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
 ) -> List[Game]:
     """
     Get games list
+
+    When `limit` is set and more games follow, the cursor of the last game is returned
+    in the X-Next-Cursor header and can be passed as `after` to get the next page.
     """
-    return GameController.get_games(db, user)
+    games = GameController.get_games(
+        db, user,
+        limit=limit + 1 if limit else None,
+        after=decode_cursor_or_422(after, datetime.fromisoformat, UUID) if after else None,
+    )
+
+    if limit and len(games) > limit:
+        games = games[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(games[-1].created_at.isoformat(), games[-1].id)
+
+    return games
 
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=Game)
-async def create_game(
+def create_game(
     payload: GameCreate,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
@@ -40,7 +61,7 @@ async def create_game(
 
 
 @router.put('/{game_id}', status_code=status.HTTP_200_OK, response_model=Game)
-async def update_game(
+def update_game(
     game_id: UUID,
     payload: GameUpdate,
     db: Session = Depends(get_session),
@@ -56,7 +77,7 @@ async def update_game(
 
 
 @router.delete('/{game_id}', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_game(
+def delete_game(
     game_id: UUID,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
@@ -71,7 +92,7 @@ async def delete_game(
 
 
 @router.get('/{game_id}/guests', status_code=status.HTTP_200_OK, response_model=List[UserSchema])
-async def get_game_guests(
+def get_game_guests(
     game_id: UUID,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
@@ -86,7 +107,7 @@ async def get_game_guests(
 
 
 @router.post('/{game_id}/guests', status_code=status.HTTP_200_OK, response_model=List[UserSchema])
-async def add_game_guests(
+def add_game_guests(
     game_id: UUID,
     payload: GameGuestCreate,
     db: Session = Depends(get_session),
@@ -110,7 +131,7 @@ async def add_game_guests(
 
 
 @router.delete('/{game_id}/guests/{user_id}', status_code=status.HTTP_200_OK, response_model=List[UserSchema])
-async def remove_game_guests(
+def remove_game_guests(
     game_id: UUID,
     user_id: UUID,
     db: Session = Depends(get_session),
@@ -126,7 +147,7 @@ async def remove_game_guests(
 
 
 @router.post('/{game_id}/stage-1', status_code=status.HTTP_201_CREATED, response_model=GameFirstStage)
-async def create_first_stage(
+def create_first_stage(
     game_id: UUID,
     payload: GameFirstStageCreate,
     db: Session = Depends(get_session),
@@ -149,14 +170,55 @@ async def create_first_stage(
         ])
 
 
-@router.get('/{game_id}/stage-1/next', status_code=status.HTTP_200_OK, response_model=Name)
-async def get_first_stage_next(
+@router.post('/{game_id}/stage-1/batch', status_code=status.HTTP_200_OK, response_model=List[GameFirstStageBatchResult])
+def create_first_stages(
     game_id: UUID,
+    payload: List[GameFirstStageCreate] = Body(..., min_items=1, max_items=1000),
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
-) -> Game:
+) -> List[GameFirstStageBatchResult]:
+    """
+    Post several choices for the first stage
+    """
+    try:
+        return GameController.create_first_stages(db, game_id, payload, user)
+    except NoResultFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='game not found')
+
+
+@router.get('/{game_id}/stage-1/votes', status_code=status.HTTP_200_OK, response_model=List[GameFirstStageVote])
+def get_first_stage_votes(
+    game_id: UUID,
+    request: Request,
+    stream: bool = False,
+    db: Session = Depends(get_session),
+    user: User = Depends(get_user)
+) -> List[GameFirstStageVote]:
+    """
+    Get the choices made by the members in the first stage of a game
+
+    With `stream=1` or an `application/x-ndjson` Accept header, choices are streamed as
+    newline delimited JSON from a server-side cursor.
+    """
+    try:
+        votes = GameController.iter_first_stage_votes(db, game_id, user)
+    except NoResultFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='game not found')
+
+    if wants_stream(request, stream):
+        return stream_ndjson(votes, GameFirstStageVote)
+
+    return list(votes)
+
+
+@router.get('/{game_id}/stage-1/next', status_code=status.HTTP_200_OK, response_model=Optional[Name])
+def get_first_stage_next(
+    game_id: UUID,
+    db: Session = Depends(get_session),
+    user: User = Depends(get_user)
+) -> Optional[CatalogName]:
     """
-    Get the next name for the first stage
+    Get the next name for the first stage, or null when every name has been voted
     """
     try:
         return GameController.get_first_stage_next(db, game_id, user)
@@ -164,16 +226,54 @@ async def get_first_stage_next(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='game not found')
 
 
+@router.get('/{game_id}/stage-1/next-names', status_code=status.HTTP_200_OK, response_model=List[Name])
+def get_first_stage_next_names(
+    game_id: UUID,
+    response: Response,
+    count: int = Query(..., ge=1, le=100),
+    after: Optional[str] = None,
+    db: Session = Depends(get_session),
+    user: User = Depends(get_user)
+) -> List[CatalogName]:
+    """
+    Get the next `count` names for the first stage
+
+    The cursor of the last name is returned in the X-Next-Cursor header and can be passed
+    as `after` to get the names following it.
+    """
+    try:
+        names = GameController.get_first_stage_next_names(
+            db, game_id, user, count,
+            after=decode_cursor_or_422(after, str, UUID) if after else None,
+        )
+    except NoResultFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='game not found')
+
+    if names:
+        response.headers['X-Next-Cursor'] = encode_cursor(names[-1].value, names[-1].id)
+
+    return names
+
+
 @router.get('/{game_id}/stage-1/result', status_code=status.HTTP_200_OK, response_model=List[Name])
-async def get_first_stage_result(
+def get_first_stage_result(
     game_id: UUID,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
-) -> Game:
+) -> Union[List[CatalogName], JSONBytesResponse]:
     """
     Get the result of the first stage of a game
     """
+    # The names are read from the database: the fragments of any snapshot can encode them,
+    # since names are never updated, and the ones missing from it are encoded individually
+    snapshot = name_catalog.current
+
     try:
-        return GameController.get_first_stage_result(db, game_id, user)
+        names = GameController.get_first_stage_result(db, game_id, user)
     except NoResultFound:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='game not found')
+
+    if name_encoder.enabled:
+        return JSONBytesResponse(name_encoder.encode(names, snapshot))
+
+    return names
@@ -1,15 +1,18 @@
+from app.auth import get_user
 from app.controllers.health import HealthController
-from app.database import get_session
-from app.schemas.health import HealthResponse, HealthStatus
-from fastapi import APIRouter, Depends, Response, status
+from app.database import get_session, slow_query_log
+from app.models.users import User
+from app.schemas.health import HealthResponse, HealthStatus, PoolStatus, SlowQuery
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
+from typing import List
 
 
 router = APIRouter()
 
 
 @router.get('', response_model=HealthResponse)
-async def health(
+def health(
     response: Response,
     db: Session = Depends(get_session)
 ):
@@ -22,3 +25,30 @@ async def health(
         response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
 
     return HealthResponse(status=result)
+
+
+@router.get('/pool', response_model=PoolStatus)
+def pool_status():
+    """
+    Get the usage of the database connection pool
+    """
+    return HealthController.pool_status()
+
+
+@router.get('/slow-queries', response_model=List[SlowQuery])
+def slow_queries(
+    limit: int = Query(10, ge=1, le=100),
+    user: User = Depends(get_user)
+):
+    """
+    Get the slowest statement fingerprints recorded by the slow query log
+
+    Statements are recorded when they are slower than DB_SLOW_QUERY_THRESHOLD milliseconds,
+    with the route and the controller method which executed them. They expose the SQL and
+    the plans of the requests of every user, so only the users listed in DB_SLOW_QUERY_READERS
+    can read them.
+    """
+    if user.username not in slow_query_log.readers:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='not allowed to read the slow queries')
+
+    return HealthController.slow_queries(limit)
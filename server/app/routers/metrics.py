@@ -0,0 +1,15 @@
+from app.metrics import generate_metrics
+from fastapi import APIRouter, Response
+
+
+router = APIRouter()
+
+
+@router.get('', response_class=Response)
+def metrics():
+    """
+    Get the metrics of the application in the Prometheus text format
+    """
+    content, media_type = generate_metrics()
+
+    return Response(content, media_type=media_type)
@@ -1,12 +1,18 @@
 from app.auth import get_user
+from app.catalog import name_catalog
+from app.conditional import etag_matches, make_etag, names_cache_policy
 from app.controllers.names import NameController
 from app.database import get_session
-from app.exceptions import AlreadyExists
+from app.exceptions import AlreadyExists, BodyTooLarge
 from app.models.users import User
-from app.schemas.names import Name, NameCreate, NameGender
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.pagination import decode_cursor_or_422, encode_cursor
+from app.schemas.names import Name, NameCreate, NameGender, NameImportResult
+from app.serialization import JSONBytesResponse, name_encoder
+from app.streaming import body_reader, stream_ndjson, wants_stream
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from uuid import UUID
 
@@ -15,19 +21,87 @@ router = APIRouter()
 
 
 @router.get('', response_model=List[Name])
-async def get_names(
+def get_names(
+    request: Request,
+    response: Response,
     gender: Optional[NameGender] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    stream: bool = False,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
 ) -> List[Name]:
     """
     Get names list
+
+    When `limit` is set and more names follow, the cursor of the last name is returned
+    in the X-Next-Cursor header and can be passed as `after` to get the next page.
+
+    With `stream=1` or an `application/x-ndjson` Accept header, names are streamed as
+    newline delimited JSON.
+
+    Responses carry an ETag derived from the catalog version: a request whose If-None-Match
+    matches it gets an empty 304 response.
     """
-    return NameController.get_names(db, gender=gender)
+    # The names, their ETag and their encoding all come from this snapshot
+    snapshot = name_catalog.snapshot(db)
+    names = NameController.get_names(
+        db, gender=gender,
+        limit=limit + 1 if limit else None,
+        after=decode_cursor_or_422(after, str, UUID) if after else None,
+        snapshot=snapshot,
+    )
+
+    ndjson = wants_stream(request, stream)
+    etag = make_etag('names', snapshot.version, gender, limit, after, ndjson)
+
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = names_cache_policy.cache_control
+
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response.headers)
+
+    if limit and len(names) > limit:
+        names = names[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(names[-1].value, names[-1].id)
+
+    if ndjson:
+        streaming_response = stream_ndjson(names, Name)
+        streaming_response.headers.update(response.headers)
+
+        return streaming_response
+
+    if name_encoder.enabled:
+        return JSONBytesResponse(name_encoder.encode(names, snapshot), headers=response.headers)
+
+    return names
+
+
+@router.get('/search', response_model=List[Name])
+def search_names(
+    q: str = Query(..., min_length=1, max_length=100),
+    gender: Optional[NameGender] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_session),
+    user: User = Depends(get_user)
+) -> List[Name]:
+    """
+    Search names
+
+    Names equal to `q` come first, ignoring accents and case, then names starting with it,
+    names with another word starting with it, and finally the most similar names.
+    """
+    snapshot = name_catalog.snapshot(db)
+    names = NameController.search_names(db, q, gender=gender, limit=limit, snapshot=snapshot)
+
+    if name_encoder.enabled:
+        return JSONBytesResponse(name_encoder.encode(names, snapshot))
+
+    return names
 
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=Name)
-async def create_name(
+def create_name(
     payload: NameCreate,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
@@ -39,7 +113,7 @@ async def create_name(
         return NameController.create_name(db, payload)
     except AlreadyExists as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=[
-            { 
+            {
                 'loc': ['body', e.fields[0]],
                 'msg': "this name already exists",
                 'type': 'type_error.already_exists',
@@ -47,8 +121,35 @@ async def create_name(
         ])
 
 
+@router.post('/bulk', status_code=status.HTTP_200_OK, response_model=NameImportResult, openapi_extra={
+    'requestBody': {'required': True, 'content': {'text/csv': {'schema': {'type': 'string'}}}},
+})
+async def import_names(
+    request: Request,
+    db: Session = Depends(get_session),
+    user: User = Depends(get_user)
+) -> NameImportResult:
+    """
+    Import names from a CSV body of "value,gender" lines, skipping the existing ones
+
+    The body is imported while it is received, and rejected with a 413 when it is too large.
+    """
+    try:
+        return await run_in_threadpool(NameController.import_names, db, body_reader.iter_lines(request))
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f'the CSV cannot exceed {e.max_size} bytes')
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=[
+            {
+                'loc': ['body'],
+                'msg': 'the CSV must be encoded in UTF-8',
+                'type': 'value_error.encoding',
+            }
+        ])
+
+
 @router.delete('/{name_id}', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_name(
+def delete_name(
     name_id: UUID,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
@@ -1,11 +1,13 @@
 from app.auth import get_user
 from app.controllers.users import UserController
 from app.database import get_session
+from app.pagination import decode_cursor_or_422, encode_cursor
 from app.schemas.users import User
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.streaming import stream_ndjson, wants_stream
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 
@@ -13,18 +15,48 @@ router = APIRouter()
 
 
 @router.get('', response_model=List[User])
-async def get_users(
+def get_users(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    stream: bool = False,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
 ) -> List[User]:
     """
     Get all users
+
+    When `limit` is set and more users follow, the cursor of the last user is returned
+    in the X-Next-Cursor header and can be passed as `after` to get the next page.
+
+    With `stream=1` or an `application/x-ndjson` Accept header, users are streamed as
+    newline delimited JSON, with the same next cursor. Without `limit`, they are read from
+    a server-side cursor.
     """
-    return UserController.get_users(db)
+    after_username = decode_cursor_or_422(after, str)[0] if after else None
+    ndjson = wants_stream(request, stream)
+
+    if ndjson and not limit:
+        return stream_ndjson(UserController.iter_users(db, after=after_username), User)
+
+    users = UserController.get_users(db, limit=limit + 1 if limit else None, after=after_username)
+
+    if limit and len(users) > limit:
+        users = users[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(users[-1].username)
+
+    if ndjson:
+        streaming_response = stream_ndjson(users, User)
+        streaming_response.headers.update(response.headers)
+
+        return streaming_response
+
+    return users
 
 
 @router.get('/{user_id}', response_model=User)
-async def get_user(
+def get_user(
     user_id: UUID,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
@@ -39,7 +71,7 @@ async def get_user(
 
 
 @router.delete('/{user_id}', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(
+def delete_user(
     user_id: UUID,
     db: Session = Depends(get_session),
     user: User = Depends(get_user)
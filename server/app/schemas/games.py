@@ -1,6 +1,7 @@
 from app.schemas import Base
 from app.schemas.names import Name, NameGender
 from app.schemas.users import User
+from enum import Enum
 from pydantic import BaseModel
 from typing import Optional
 from uuid import UUID
@@ -54,3 +55,26 @@ class GameFirstStage(Base):
     user: User
     name: Name
     choice: bool
+
+
+class GameFirstStageVote(Base):
+    """
+    First stage choice export schema
+    """
+    user_id: UUID
+    name_id: UUID
+    choice: bool
+
+
+class GameFirstStageBatchStatus(str, Enum):
+    created = 'created'
+    already_exists = 'already_exists'
+    unknown_name = 'unknown_name'
+
+
+class GameFirstStageBatchResult(BaseModel):
+    """
+    Status of a choice submitted in a batch
+    """
+    name_id: UUID
+    status: GameFirstStageBatchStatus
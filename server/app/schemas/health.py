@@ -1,6 +1,7 @@
 import enum
 from enum import Enum
 from pydantic import BaseModel
+from typing import Optional
 
 
 class HealthStatus(str, Enum):
@@ -13,3 +14,26 @@ class HealthResponse(BaseModel):
 
     class Config:
         use_enum_values = True
+
+
+class PoolStatus(BaseModel):
+    size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+
+
+class SlowQuery(BaseModel):
+    id: str
+    fingerprint: str
+    count: int
+    total_time: float
+    max_time: float
+    statement: str
+    route: Optional[str]
+    origin: Optional[str]
+    plan: Optional[str]
+
+    class Config:
+        orm_mode = True
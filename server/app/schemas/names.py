@@ -22,3 +22,14 @@ class Name(Base):
     """
     value: str
     gender: NameGender
+
+
+class NameImportResult(BaseModel):
+    """
+    Counts of a bulk name import
+    """
+    read: int
+    invalid: int
+    duplicates: int
+    inserted: int
+    skipped: int
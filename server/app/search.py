@@ -0,0 +1,156 @@
+import bisect
+import math
+import re
+import unicodedata
+
+from app.catalog import CatalogName, CatalogSnapshot
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def fold(value: str) -> str:
+    """
+    Fold a value for matching: without accents, case-insensitive, words separated by a space
+    """
+    decomposed = unicodedata.normalize('NFKD', value)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+    return ' '.join(re.split(r'[\W_]+', stripped.casefold())).strip()
+
+
+def trigrams(value: str) -> Set[str]:
+    """
+    Get the trigrams of a folded value, each word padded like pg_trgm does
+    """
+    result = set()
+
+    for word in value.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    return result
+
+
+class NameIndex:
+    """
+    Search index over the names of a catalog snapshot
+
+    Prefixes are looked up by bisection in the sorted folded names and word suffixes of the
+    names, so "pierre" finds "Jean-Pierre". Fuzzy matching ranks names by the similarity of their
+    trigrams with the query, like pg_trgm.
+    """
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.version = snapshot.version
+        self.names = snapshot.list()
+
+        name_keys = []
+        word_keys = []
+        self.trigrams: List[Set[str]] = []
+        self.postings: Dict[str, List[int]] = {}
+
+        for position, name in enumerate(self.names):
+            folded = fold(name.value)
+            words = folded.split(' ')
+
+            name_keys.append((folded, position))
+            word_keys.extend((' '.join(words[i:]), position) for i in range(1, len(words)))
+
+            name_trigrams = trigrams(folded)
+            self.trigrams.append(name_trigrams)
+
+            for trigram in name_trigrams:
+                self.postings.setdefault(trigram, []).append(position)
+
+        # Sorted (key, position) of whole names and of the other words of the names
+        self.name_keys = sorted(name_keys)
+        self.word_keys = sorted(word_keys)
+
+    def search(self, query: str, gender: Optional[str] = None, limit: int = 10, threshold: float = 0.3) -> List[CatalogName]:
+        """
+        Get the names matching the query: the exact ones, the ones starting with it, the ones
+        with a word starting with it, then the most similar ones
+        """
+        folded = fold(query)
+
+        if not folded:
+            return []
+
+        matches = self.prefix_positions(folded, gender, limit)
+
+        if len(matches) < limit:
+            found = set(matches)
+            similar = list(
+                position for similarity, position in self.similar_positions(folded, gender, threshold)
+                if position not in found
+            )
+            matches.extend(similar[:limit - len(matches)])
+
+        return list(self.names[position] for position in matches)
+
+    def prefix_positions(self, folded: str, gender: Optional[str], limit: int) -> List[int]:
+        positions = []
+
+        # Exact match first since it sorts first, then names starting with the query, then
+        # names with another word starting with it
+        for keys in (self.name_keys, self.word_keys):
+            idx = bisect.bisect_left(keys, (folded,))
+
+            while idx < len(keys) and len(positions) < limit and keys[idx][0].startswith(folded):
+                position = keys[idx][1]
+
+                if (gender is None or self.names[position].gender == gender) and position not in positions:
+                    positions.append(position)
+
+                idx += 1
+
+        return positions
+
+    def similar_positions(self, folded: str, gender: Optional[str], threshold: float) -> List[Tuple[float, int]]:
+        query_trigrams = trigrams(folded)
+
+        if not query_trigrams:
+            return []
+
+        # A name at least as similar as the threshold shares at least `needed` trigrams with the
+        # query, so it appears in one of the posting lists of the len - needed + 1 rarest ones
+        needed = max(1, math.ceil(threshold * len(query_trigrams) - 1e-9))
+        rarest = sorted(query_trigrams, key=lambda trigram: len(self.postings.get(trigram, ())))
+        candidates = set().union(*(self.postings.get(trigram, ()) for trigram in rarest[:len(rarest) - needed + 1]))
+
+        result = []
+
+        for position in candidates:
+            if gender is not None and self.names[position].gender != gender:
+                continue
+
+            count = len(query_trigrams & self.trigrams[position])
+            similarity = count / (len(query_trigrams) + len(self.trigrams[position]) - count)
+
+            if similarity >= threshold:
+                result.append((-similarity, position))
+
+        result.sort()
+
+        return list((-similarity, position) for similarity, position in result)
+
+
+class NameSearch:
+    """
+    Name search over the catalog, with an index built once per catalog version
+    """
+    def __init__(self):
+        self._index = None
+
+    def index(self, snapshot: CatalogSnapshot) -> NameIndex:
+        index = self._index
+
+        if index is None or index.version != snapshot.version:
+            index = NameIndex(snapshot)
+            self._index = index
+
+        return index
+
+    def search(self, snapshot: CatalogSnapshot, query: str, gender: Optional[str] = None, limit: int = 10) -> List[CatalogName]:
+        return self.index(snapshot).search(query, gender, limit)
+
+
+name_search = NameSearch()
@@ -0,0 +1,58 @@
+import orjson
+
+from app.catalog import CatalogName, CatalogSnapshot
+from fastapi import Response
+from typing import Dict, Optional, Sequence
+from uuid import UUID
+
+
+class JSONBytesResponse(Response):
+    """
+    Response with a body already encoded as JSON
+    """
+    media_type = 'application/json'
+
+
+class NameEncoder:
+    """
+    Encode names to JSON without going through the pydantic response model
+
+    The output is byte for byte the one of the `Name` response model. Names of the catalog are
+    encoded once per snapshot version and their JSON fragments are reused by every response.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._fragments = None
+
+    def encode(self, names: Sequence[CatalogName], snapshot: Optional[CatalogSnapshot] = None) -> bytes:
+        """
+        Encode a list of names, reusing the fragments of the snapshot they come from
+        """
+        fragments = self.get_fragments(snapshot) if snapshot else {}
+
+        return b'[' + b','.join(fragments.get(name.id) or self.encode_name(name) for name in names) + b']'
+
+    def get_fragments(self, snapshot: CatalogSnapshot) -> Dict[UUID, bytes]:
+        """
+        Get the JSON fragments of all the names of a snapshot, by id
+        """
+        cached = self._fragments
+
+        if cached is None or cached[0] != snapshot.version:
+            cached = (snapshot.version, {name.id: self.encode_name(name) for name in snapshot.list()})
+            self._fragments = cached
+
+        return cached[1]
+
+    @staticmethod
+    def encode_name(name: CatalogName) -> bytes:
+        return orjson.dumps({
+            'id': name.id,
+            'created_at': name.created_at,
+            'updated_at': name.updated_at,
+            'value': name.value,
+            'gender': name.gender,
+        })
+
+
+name_encoder = NameEncoder()
@@ -0,0 +1,97 @@
+import anyio
+import codecs
+
+from app.exceptions import BodyTooLarge
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, Iterable, Iterator, Optional, Type
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def wants_stream(request: Request, stream: bool = False) -> bool:
+    """
+    Whether the client asked for a streamed response, with `?stream=1` or an NDJSON `Accept` header
+    """
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def stream_ndjson(rows: Iterable[Any], schema: Type[BaseModel], chunk_size: int = 100) -> StreamingResponse:
+    """
+    Stream rows as newline delimited JSON, serialized with an orm_mode schema
+
+    Rows are consumed while the response is written, so a query iterated with
+    `yield_per` never has more than one batch in memory.
+    """
+    def lines() -> Iterator[str]:
+        chunk = []
+
+        for row in rows:
+            chunk.append(schema.from_orm(row).json())
+
+            if len(chunk) >= chunk_size:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+class BodyReader:
+    """
+    Read request bodies as lines of text, without buffering them
+
+    The lines are decoded incrementally while the body is received, from the worker thread
+    of a blocking handler, so a body is never held in memory as a whole. Bodies larger
+    than `max_size` bytes are rejected with BodyTooLarge.
+    """
+    def __init__(self, max_size: int = 10 * 1024 * 1024):
+        self.max_size = max_size
+
+    def iter_lines(self, request: Request, encoding: str = 'utf-8-sig') -> Iterator[str]:
+        """
+        Iterate over the lines of a request body, keeping their line endings
+
+        Must be consumed from a worker thread, like the ones running blocking handlers.
+        Raises UnicodeDecodeError when the body is not valid in the given encoding.
+        """
+        if int(request.headers.get('content-length') or 0) > self.max_size:
+            raise BodyTooLarge(self.max_size)
+
+        stream = request.stream()
+        decoder = codecs.getincrementaldecoder(encoding)()
+        size = 0
+        pending = ''
+
+        async def receive() -> Optional[bytes]:
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        while True:
+            chunk = anyio.from_thread.run(receive)
+
+            if chunk is None:
+                break
+
+            size += len(chunk)
+            if size > self.max_size:
+                raise BodyTooLarge(self.max_size)
+
+            *lines, pending = (pending + decoder.decode(chunk)).split('\n')
+
+            for line in lines:
+                yield line + '\n'
+
+        pending += decoder.decode(b'', final=True)
+
+        if pending:
+            yield pending
+
+
+body_reader = BodyReader()
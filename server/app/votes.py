@@ -0,0 +1,147 @@
+import threading
+
+from app.cache import TTLCache
+from app.catalog import CatalogSnapshot
+from app.models.games import GameFirstStage
+from sqlalchemy.orm import Session
+from typing import Iterable, List, NamedTuple, Optional
+from uuid import UUID
+
+
+class VoteBitset(NamedTuple):
+    """
+    Names voted by a user in a game, as a bitset keyed by catalog position
+    """
+    version: int
+    bits: int
+
+
+class VoteTracker:
+    """
+    Per (game, user) bitsets of the names already voted in the first stage
+
+    Bitsets are built lazily from the database and updated on each vote made by this
+    process. As votes can also be made by other processes, the names selected from a
+    bitset are checked against the database before being returned.
+    """
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, snapshot: CatalogSnapshot, game_id: UUID, user_id: UUID) -> int:
+        """
+        Get the bitset of the names voted by a user in a game
+        """
+        entry = self._cache.get((game_id, user_id))
+
+        if entry is None or entry.version != snapshot.version:
+            entry = VoteBitset(snapshot.version, self.load(db, snapshot, game_id, user_id))
+            self._cache.set((game_id, user_id), entry)
+
+        return entry.bits
+
+    def load(self, db: Session, snapshot: CatalogSnapshot, game_id: UUID, user_id: UUID) -> int:
+        """
+        Build the bitset of the names voted by a user in a game from the database
+        """
+        q = db.query(GameFirstStage.name_id)
+        q = q.filter(GameFirstStage.game_id == game_id, GameFirstStage.user_id == user_id)
+
+        return self.to_bits(snapshot, (name_id for name_id, in q))
+
+    def add(self, game_id: UUID, user_id: UUID, name_ids: Iterable[UUID], snapshot: CatalogSnapshot) -> None:
+        """
+        Record new votes of a user in a game
+        """
+        with self._lock:
+            entry = self._cache.get((game_id, user_id))
+
+            if entry is None:
+                return
+
+            if entry.version != snapshot.version:
+                self._cache.invalidate((game_id, user_id))
+                return
+
+            self._cache.set((game_id, user_id), VoteBitset(entry.version, entry.bits | self.to_bits(snapshot, name_ids)))
+
+    def next_positions(self, db: Session, snapshot: CatalogSnapshot, game_id: UUID, user_id: UUID, gender: Optional[str] = None, start: int = 0, count: int = 1) -> List[int]:
+        """
+        Get the catalog positions of the next names not voted by a user in a game
+        """
+        size = len(snapshot)
+        excluded = snapshot.exclusion_mask(gender) | ((1 << start) - 1)
+
+        while True:
+            voted = self.get(db, snapshot, game_id, user_id)
+            positions = self.first_zero_bits(voted | excluded, count, size)
+
+            if not positions:
+                return positions
+
+            # Consistency check: names voted through another process are not in the bitset yet
+            names = snapshot.list()
+            q = db.query(GameFirstStage.name_id)
+            q = q.filter(
+                GameFirstStage.game_id == game_id,
+                GameFirstStage.user_id == user_id,
+                GameFirstStage.name_id.in_([names[position].id for position in positions]),
+            )
+            missing = list(name_id for name_id, in q)
+
+            if not missing:
+                return positions
+
+            self.add(game_id, user_id, missing, snapshot)
+            excluded |= self.to_bits(snapshot, missing)
+
+    def check(self, db: Session, snapshot: CatalogSnapshot, game_id: UUID, user_id: UUID) -> bool:
+        """
+        Check the bitset of a user in a game against the database
+        """
+        return self.get(db, snapshot, game_id, user_id) == self.load(db, snapshot, game_id, user_id)
+
+    def clear(self) -> None:
+        """
+        Forget all the bitsets
+        """
+        self._cache.clear()
+
+    @staticmethod
+    def to_bits(snapshot: CatalogSnapshot, name_ids: Iterable[UUID]) -> int:
+        """
+        Convert name ids into a bitset keyed by catalog position
+        """
+        positions = snapshot.partitions[None].positions
+        buffer = bytearray((len(snapshot) + 7) // 8)
+
+        for name_id in name_ids:
+            position = positions.get(name_id)
+
+            if position is not None:
+                buffer[position >> 3] |= 1 << (position & 7)
+
+        return int.from_bytes(buffer, 'little')
+
+    @staticmethod
+    def first_zero_bits(bits: int, count: int, size: int) -> List[int]:
+        """
+        Get the positions of the first zero bits below size
+        """
+        positions = []
+
+        while len(positions) < count:
+            # Isolate the lowest zero bit
+            lowest = ~bits & (bits + 1)
+            position = lowest.bit_length() - 1
+
+            if position >= size:
+                break
+
+            positions.append(position)
+            bits |= lowest
+
+        return positions
+
+
+vote_tracker = VoteTracker()
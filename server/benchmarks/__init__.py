@@ -0,0 +1,43 @@
+import math
+import time
+
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Return the nearest-rank percentile of a list of values
+    """
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+
+    return ordered[rank - 1]
+
+
+def summarize(durations: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Summarize request durations (in seconds) as throughput and latency percentiles (in milliseconds)
+    """
+    return {
+        'requests': len(durations),
+        'throughput': len(durations) / elapsed if elapsed else 0.0,
+        'p50': percentile(durations, 50) * 1000,
+        'p95': percentile(durations, 95) * 1000,
+        'p99': percentile(durations, 99) * 1000,
+    }
+
+
+class Timer:
+    """
+    Context manager measuring the wall clock duration of a block
+    """
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.start
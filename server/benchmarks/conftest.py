@@ -0,0 +1,118 @@
+"""
+Fixtures of the micro-benchmarks, run with pytest-benchmark against the database configured by
+the DB_* environment variables. They seed their own names, users, game and votes, and remove
+them when done. Use a dedicated database:
+
+    pytest benchmarks/ --benchmark-only --benchmark-group-by=func
+    pytest benchmarks/ --benchmark-only -k 100k --benchmark-save=before
+    pytest benchmarks/ --benchmark-only -k 100k --benchmark-compare
+"""
+import math
+import uuid
+
+from app.catalog import name_catalog
+from app.database import SessionLocal
+from app.models.games import Game, GameFirstStage, GameGuest
+from app.models.names import Name
+from app.models.users import User
+from pytest import fixture
+from sqlalchemy import insert, select
+from typing import Callable, List, NamedTuple
+
+
+PREFIX = 'benchmark-'
+
+# Names of the seeded catalogue, and maximum number of votes of a member
+NAMES = 2000
+VOTES_PER_USER = 1500
+
+SIZES = [1000, 10000, 100000]
+
+
+def size_id(size: int) -> str:
+    return f'{size // 1000}k'
+
+
+class Dataset(NamedTuple):
+    """
+    A game whose owner and guests made `votes` choices, the owner voting first
+    """
+    votes: int
+    game_id: uuid.UUID
+    owner: User
+    guests: List[User]
+    outsider: User
+    name_ids: List[uuid.UUID]
+
+
+def in_session(function: Callable, *args, **kwargs):
+    """
+    Call a controller method with a new session, as a request would
+    """
+    db = SessionLocal()
+
+    try:
+        return function(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+def seed(db, votes: int) -> Dataset:
+    names = [{'id': uuid.uuid4(), 'value': f'{PREFIX}{i:06d}', 'gender': 'MF'[i % 2]} for i in range(NAMES)]
+    users = [{'id': uuid.uuid4(), 'username': f'{PREFIX}{i:06d}'} for i in range(math.ceil(votes / VOTES_PER_USER) + 1)]
+    game_id = uuid.uuid4()
+
+    db.execute(insert(Name), names)
+    db.execute(insert(User), users)
+    db.execute(insert(Game), [{'id': game_id, 'owner_id': users[0]['id'], 'description': f'{PREFIX}micro'}])
+
+    # The last user is not a member of the game
+    members, outsider = users[:-1], users[-1]
+
+    if len(members) > 1:
+        db.execute(insert(GameGuest), [{'game_id': game_id, 'user_id': user['id']} for user in members[1:]])
+
+    rows = []
+    for i, user in enumerate(members):
+        count = min(VOTES_PER_USER, votes - i * VOTES_PER_USER)
+        rows.extend({'game_id': game_id, 'user_id': user['id'], 'name_id': name['id'], 'choice': j % 3 != 0} for j, name in enumerate(names[:count]))
+
+    for i in range(0, len(rows), 5000):
+        db.execute(insert(GameFirstStage), rows[i:i + 5000])
+
+    db.commit()
+    db.execute('ANALYZE')
+
+    return Dataset(
+        votes=votes,
+        game_id=game_id,
+        owner=User(**members[0]),
+        guests=[User(**user) for user in members[1:]],
+        outsider=User(**outsider),
+        name_ids=[name['id'] for name in names],
+    )
+
+
+def cleanup(db) -> None:
+    games = select(Game.id).where(Game.description.startswith(PREFIX))
+
+    db.query(GameFirstStage).filter(GameFirstStage.game_id.in_(games)).delete(synchronize_session=False)
+    db.query(GameGuest).filter(GameGuest.game_id.in_(games)).delete(synchronize_session=False)
+    db.query(Game).filter(Game.description.startswith(PREFIX)).delete(synchronize_session=False)
+    db.query(User).filter(User.username.startswith(PREFIX)).delete(synchronize_session=False)
+    db.query(Name).filter(Name.value.startswith(PREFIX)).delete(synchronize_session=False)
+    db.commit()
+
+
+@fixture(scope='session', params=SIZES, ids=size_id)
+def dataset(request) -> Dataset:
+    db = SessionLocal()
+    cleanup(db)
+
+    try:
+        yield seed(db, request.param)
+    finally:
+        db.rollback()
+        cleanup(db)
+        db.close()
+        name_catalog.invalidate()
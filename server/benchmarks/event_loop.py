@@ -0,0 +1,79 @@
+"""
+Measure the latency of concurrent requests against a running server.
+
+Run it against two builds of the server to compare the p99 latency before and after a change:
+
+    python -m benchmarks.event_loop --url http://127.0.0.1:8000 --concurrency 100 --duration 30 \
+        /health /games /names
+"""
+import argparse
+import requests
+import threading
+import time
+
+from benchmarks import Timer, summarize
+from collections import defaultdict
+from typing import Dict, List
+
+
+def worker(url: str, paths: List[str], headers: Dict[str, str], deadline: float, results: Dict[str, List[float]], lock: threading.Lock):
+    session = requests.Session()
+    session.headers.update(headers)
+    durations = defaultdict(list)
+    errors = 0
+
+    while time.monotonic() < deadline:
+        for path in paths:
+            try:
+                with Timer() as t:
+                    r = session.get(url + path)
+            except requests.RequestException:
+                errors += 1
+                continue
+
+            if r.status_code >= 500:
+                errors += 1
+
+            durations[path].append(t.elapsed)
+
+    with lock:
+        for path, values in durations.items():
+            results[path].extend(values)
+        results['errors'].append(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent latency benchmark')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server')
+    parser.add_argument('--user', default='benchmark', help='Value of the authentication header')
+    parser.add_argument('--auth-header', default='X-Remote-User', help='Name of the authentication header')
+    parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='Duration of the benchmark in seconds')
+    parser.add_argument('paths', nargs='*', default=['/health', '/games', '/names'], help='Paths requested by each client')
+    args = parser.parse_args()
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(args.url.rstrip('/'), args.paths, {args.auth_header: args.user}, deadline, results, lock),
+        ) for _ in range(args.concurrency)
+    ]
+
+    with Timer() as t:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    print(f'{"path":<40} {"requests":>9} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for path in args.paths:
+        s = summarize(results[path], t.elapsed)
+        print(f'{path:<40} {s["requests"]:>9} {s["throughput"]:>9.1f} {s["p50"]:>9.1f} {s["p95"]:>9.1f} {s["p99"]:>9.1f}')
+    print(f'server errors: {sum(results["errors"])}')
+
+
+if __name__ == '__main__':
+    main()
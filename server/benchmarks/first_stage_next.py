@@ -0,0 +1,132 @@
+"""
+Measure the latency of the stage-1 "next names" as a user votes on more and more names.
+
+It seeds its own names, user and game in the database configured by the DB_* environment
+variables, and removes them when done. Use a dedicated database:
+
+    python -m benchmarks.first_stage_next --names 22000 --votes 0 5000 10000 20000
+
+By default the controller is measured, picking the names from the vote bitsets. The SQL
+queries it replaced are kept for comparison: `--path not-exists` for the anti-join and
+`--path not-in` for the original query.
+"""
+import argparse
+import uuid
+
+from app.controllers.games import GameController
+from app.database import SessionLocal
+from app.models.games import Game, GameFirstStage
+from app.models.names import Name
+from app.models.users import User
+from benchmarks import Timer, summarize
+from sqlalchemy import insert
+from typing import List
+
+
+PREFIX = 'benchmark-'
+PATHS = ['controller', 'not-exists', 'not-in']
+
+
+def seed(db, names_count):
+    user = User(username=f'{PREFIX}{uuid.uuid4()}')
+    db.add(user)
+    db.flush()
+
+    game = Game(owner_id=user.id, description=f'{PREFIX}first-stage-next')
+    db.add(game)
+
+    rows = [{'id': uuid.uuid4(), 'value': f'{PREFIX}{i:06d}', 'gender': 'MF'[i % 2]} for i in range(names_count)]
+    for i in range(0, len(rows), 5000):
+        db.execute(insert(Name), rows[i:i + 5000])
+
+    db.commit()
+
+    return user, game, [row['id'] for row in rows]
+
+
+def vote(db, game, user, name_ids):
+    rows = [{'game_id': game.id, 'user_id': user.id, 'name_id': name_id, 'choice': bool(i % 2)} for i, name_id in enumerate(name_ids)]
+    for i in range(0, len(rows), 5000):
+        db.execute(insert(GameFirstStage), rows[i:i + 5000])
+
+    db.commit()
+    db.execute('ANALYZE game_first_stage')
+    db.execute('ANALYZE name')
+
+
+def query_next_names(db, game, user, count: int, anti_join: bool) -> List[uuid.UUID]:
+    """
+    Get the next names of a user with a single query, excluding the voted ones with NOT EXISTS or NOT IN
+    """
+    q = db.query(Name.id)
+
+    if game.gender:
+        q = q.filter(Name.gender == game.gender)
+
+    if anti_join:
+        q = q.filter(~db.query(GameFirstStage.id).filter(
+            GameFirstStage.game_id == game.id,
+            GameFirstStage.user_id == user.id,
+            GameFirstStage.name_id == Name.id,
+        ).exists())
+    else:
+        q = q.filter(Name.id.notin_(
+            db.query(GameFirstStage.name_id).filter(GameFirstStage.game_id == game.id, GameFirstStage.user_id == user.id)
+        ))
+
+    return [name_id for name_id, in q.order_by(Name.value.asc(), Name.id.asc()).limit(count)]
+
+
+def cleanup(db, game, user):
+    db.query(GameFirstStage).filter(GameFirstStage.game_id == game.id).delete()
+    db.query(Game).filter(Game.id == game.id).delete()
+    db.query(User).filter(User.id == user.id).delete()
+    db.query(Name).filter(Name.value.startswith(PREFIX)).delete(synchronize_session=False)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stage-1 next names benchmark')
+    parser.add_argument('--names', type=int, default=22000, help='Number of names in the catalogue')
+    parser.add_argument('--count', type=int, default=1, help='Number of names requested per call')
+    parser.add_argument('--iterations', type=int, default=200, help='Number of calls per measure')
+    parser.add_argument('--votes', type=int, nargs='+', default=[0, 1000, 5000, 10000, 20000], help='Number of votes of the user for each measure')
+    parser.add_argument('--path', choices=PATHS, default='controller', help='Implementation to measure')
+    args = parser.parse_args()
+
+    if args.path == 'controller':
+        def next_names():
+            GameController.get_first_stage_next_names(db, game.id, user, args.count)
+    else:
+        def next_names():
+            query_next_names(db, game, user, args.count, anti_join=args.path == 'not-exists')
+
+    db = SessionLocal()
+    user, game, name_ids = seed(db, args.names)
+
+    try:
+        print(f'{"votes":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+        voted = 0
+
+        for votes in sorted(args.votes):
+            # Users vote in catalogue order: the voted names are the first ones
+            vote(db, game, user, name_ids[voted:votes])
+            voted = votes
+
+            durations = []
+            with Timer() as total:
+                for _ in range(args.iterations):
+                    with Timer() as t:
+                        next_names()
+                    durations.append(t.elapsed)
+
+            s = summarize(durations, total.elapsed)
+            print(f'{votes:>9} {s["p50"]:>9.2f} {s["p95"]:>9.2f} {s["p99"]:>9.2f}')
+    finally:
+        db.rollback()
+        cleanup(db, game, user)
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
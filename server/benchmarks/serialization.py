@@ -0,0 +1,88 @@
+"""
+Compare the serialization of the names list through the pydantic response model and through
+the fast JSON encoder.
+
+By default it builds 22k names in memory. With --database, it reads the names of the
+database configured by the DB_* environment variables instead, without writing anything:
+
+    python -m benchmarks.serialization --names 22000 --iterations 50
+"""
+import argparse
+import datetime
+import uuid
+
+from app.catalog import CatalogName, CatalogSnapshot, NameCatalog
+from app.database import SessionLocal
+from app.schemas.names import Name
+from app.serialization import NameEncoder
+from benchmarks import Timer, summarize
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_response_field
+from typing import List
+
+
+def pydantic_path(field, names) -> bytes:
+    """
+    What FastAPI does with a response_model: validate, encode to primitives, then dump
+    """
+    value, errors = field.validate(names, {}, loc=('response',))
+    assert not errors
+
+    return JSONResponse(jsonable_encoder(value)).body
+
+
+def build_snapshot(count: int) -> CatalogSnapshot:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    names = [CatalogName(uuid.uuid4(), f'Prénom-{i:06d}', 'MF'[i % 2], now, now) for i in range(count)]
+
+    return CatalogSnapshot(1, names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Names serialization benchmark')
+    parser.add_argument('--names', type=int, default=22000, help='Number of names built in memory')
+    parser.add_argument('--database', action='store_true', help='Use the names of the database instead')
+    parser.add_argument('--iterations', type=int, default=50, help='Number of serializations per measure')
+    args = parser.parse_args()
+
+    if args.database:
+        db = SessionLocal()
+
+        try:
+            snapshot = NameCatalog().snapshot(db)
+        finally:
+            db.close()
+    else:
+        snapshot = build_snapshot(args.names)
+
+    names = list(snapshot.list())
+    field = create_response_field(name='Response_get_names', type_=List[Name])
+    encoder = NameEncoder()
+
+    measures = [
+        ('pydantic', lambda: pydantic_path(field, names)),
+        ('fast (cold)', lambda: NameEncoder().encode(names, snapshot)),
+        ('fast', lambda: encoder.encode(names, snapshot)),
+    ]
+
+    # Both paths must produce the same body
+    assert measures[0][1]() == measures[2][1]()
+
+    print(f'{len(names)} names, {len(measures[0][1]())} bytes')
+    print(f'{"path":>12} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+
+    for label, serialize in measures:
+        durations = []
+        with Timer() as total:
+            for _ in range(args.iterations):
+                with Timer() as t:
+                    serialize()
+                durations.append(t.elapsed)
+
+        s = summarize(durations, total.elapsed)
+        print(f'{label:>12} {s["p50"]:>9.2f} {s["p95"]:>9.2f} {s["p99"]:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import uuid
+
+from .conftest import PREFIX, Dataset, in_session
+from app.catalog import name_catalog
+from app.controllers.games import GameController
+from app.controllers.names import NameController
+from app.controllers.users import UserController
+from app.database import SessionLocal
+from app.models.games import GameFirstStage, GameGuest
+from app.models.names import Name
+from app.models.users import User
+from app.schemas.games import GameCreate, GameFirstStageCreate, GameUpdate
+from app.schemas.names import NameCreate
+from app.schemas.users import UserCreate
+from sqlalchemy import insert
+
+
+ROUNDS = 20
+
+
+def execute(*statements) -> None:
+    """
+    Prepare the database for the next round of a benchmark writing to it
+    """
+    db = SessionLocal()
+
+    try:
+        for statement in statements:
+            db.execute(statement)
+        db.commit()
+    finally:
+        db.close()
+
+
+# GameController
+def test_get_games(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.get_games, dataset.owner)
+
+
+def test_get_game(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.get_game, dataset.game_id, dataset.owner)
+
+
+def test_check_game_access(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.check_game_access, dataset.game_id, dataset.guests[-1] if dataset.guests else dataset.owner)
+
+
+def test_get_game_guests(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.get_game_guests, dataset.game_id, dataset.owner)
+
+
+def test_create_game(benchmark, dataset: Dataset):
+    benchmark.pedantic(in_session, (GameController.create_game, GameCreate(description=f'{PREFIX}created'), dataset.owner), rounds=ROUNDS)
+
+
+def test_update_game(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.update_game, dataset.game_id, GameUpdate(description=f'{PREFIX}micro'), dataset.owner)
+
+
+def test_delete_game(benchmark, dataset: Dataset):
+    def setup():
+        game = in_session(GameController.create_game, GameCreate(description=f'{PREFIX}deleted'), dataset.owner)
+        return (GameController.delete_game, game.id, dataset.owner), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+
+
+def test_create_game_guest(benchmark, dataset: Dataset):
+    def setup():
+        execute(GameGuest.__table__.delete().where(GameGuest.game_id == dataset.game_id, GameGuest.user_id == dataset.outsider.id))
+        return (GameController.create_game_guest, dataset.game_id, dataset.outsider.id, dataset.owner), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+    execute(GameGuest.__table__.delete().where(GameGuest.game_id == dataset.game_id, GameGuest.user_id == dataset.outsider.id))
+
+
+def test_delete_game_guest(benchmark, dataset: Dataset):
+    def setup():
+        execute(insert(GameGuest).values(game_id=dataset.game_id, user_id=dataset.outsider.id))
+        return (GameController.delete_game_guest, dataset.game_id, dataset.outsider.id, dataset.owner), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+
+
+def test_create_first_stage(benchmark, dataset: Dataset):
+    # The owner has not voted for the last names of the catalogue
+    name_id = dataset.name_ids[-1]
+    vote = GameFirstStage.__table__.delete().where(
+        GameFirstStage.game_id == dataset.game_id, GameFirstStage.user_id == dataset.owner.id, GameFirstStage.name_id == name_id
+    )
+
+    def setup():
+        execute(vote)
+        return (GameController.create_first_stage, dataset.game_id, GameFirstStageCreate(name_id=name_id, choice=True), dataset.owner), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+    execute(vote)
+
+
+def test_create_first_stages(benchmark, dataset: Dataset):
+    name_ids = dataset.name_ids[-100:]
+    votes = GameFirstStage.__table__.delete().where(
+        GameFirstStage.game_id == dataset.game_id, GameFirstStage.user_id == dataset.owner.id, GameFirstStage.name_id.in_(name_ids)
+    )
+    payloads = [GameFirstStageCreate(name_id=name_id, choice=True) for name_id in name_ids]
+
+    def setup():
+        execute(votes)
+        return (GameController.create_first_stages, dataset.game_id, payloads, dataset.owner), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+    execute(votes)
+
+
+def test_iter_first_stage_votes(benchmark, dataset: Dataset):
+    benchmark(in_session, lambda db: list(GameController.iter_first_stage_votes(db, dataset.game_id, dataset.owner)))
+
+
+def test_get_first_stage_next(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.get_first_stage_next, dataset.game_id, dataset.owner)
+
+
+def test_get_first_stage_next_names(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.get_first_stage_next_names, dataset.game_id, dataset.owner, 20)
+
+
+def test_get_first_stage_result(benchmark, dataset: Dataset):
+    benchmark(in_session, GameController.get_first_stage_result, dataset.game_id, dataset.owner)
+
+
+# NameController
+def test_get_names(benchmark, dataset: Dataset):
+    benchmark(in_session, NameController.get_names)
+
+
+def test_get_names_page(benchmark, dataset: Dataset):
+    benchmark(in_session, NameController.get_names, limit=100, after=(f'{PREFIX}001000', dataset.name_ids[1000]))
+
+
+def test_get_catalog_position_after_removed(benchmark, dataset: Dataset):
+    # A name missing from the catalogue is looked up in the database
+    def get_position(db):
+        return NameController.get_catalog_position_after(db, name_catalog.snapshot(db), (f'{PREFIX}001000', uuid.UUID(int=0)))
+
+    benchmark(in_session, get_position)
+
+
+def test_search_names(benchmark, dataset: Dataset):
+    benchmark(in_session, NameController.search_names, 'benchmark-0015')
+
+
+def test_get_name(benchmark, dataset: Dataset):
+    benchmark(in_session, NameController.get_name, dataset.name_ids[len(dataset.name_ids) // 2])
+
+
+def test_normalize_name(benchmark):
+    benchmark(NameController.normalize_name, ['  Marie   Élise ', ' f '])
+
+
+def test_import_names(benchmark, dataset: Dataset):
+    # Every name already exists: the staging table is filled then every row conflicts
+    lines = [f'{PREFIX}{i:06d},{"MF"[i % 2]}' for i in range(len(dataset.name_ids))]
+
+    benchmark.pedantic(in_session, (NameController.import_names, lines), rounds=ROUNDS)
+
+
+def test_create_name(benchmark, dataset: Dataset):
+    def setup():
+        execute(Name.__table__.delete().where(Name.value == f'{PREFIX}created'))
+        return (NameController.create_name, NameCreate(value=f'{PREFIX}created', gender='F')), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+
+
+def test_delete_name(benchmark, dataset: Dataset):
+    def setup():
+        name_id = in_session(lambda db: NameController.create_name(db, NameCreate(value=f'{PREFIX}deleted', gender='F')).id)
+        return (NameController.delete_name, name_id), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+
+
+# UserController
+def test_get_users(benchmark, dataset: Dataset):
+    benchmark(in_session, UserController.get_users, limit=100)
+
+
+def test_iter_users(benchmark, dataset: Dataset):
+    benchmark(in_session, lambda db: list(UserController.iter_users(db)))
+
+
+def test_get_user(benchmark, dataset: Dataset):
+    benchmark(in_session, UserController.get_user, dataset.owner.id)
+
+
+def test_get_or_create_user(benchmark, dataset: Dataset):
+    benchmark(in_session, UserController.get_or_create_user, dataset.owner.username)
+
+
+def test_create_user(benchmark, dataset: Dataset):
+    def setup():
+        execute(User.__table__.delete().where(User.username == f'{PREFIX}created'))
+        return (UserController.create_user, UserCreate(username=f'{PREFIX}created')), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
+
+
+def test_delete_user(benchmark, dataset: Dataset):
+    def setup():
+        user_id = in_session(lambda db: UserController.create_user(db, UserCreate(username=f'{PREFIX}deleted')).id)
+        return (UserController.delete_user, user_id), {}
+
+    benchmark.pedantic(in_session, setup=setup, rounds=ROUNDS)
@@ -0,0 +1,57 @@
+import datetime
+import uuid
+
+from .conftest import SIZES, size_id
+from .serialization import build_snapshot, pydantic_path
+from app.models.games import Game, GameFirstStage
+from app.models.names import Name
+from app.models.users import User
+from app.schemas.games import GameFirstStage as GameFirstStageSchema
+from app.schemas.names import Name as NameSchema
+from app.serialization import NameEncoder
+from fastapi.utils import create_response_field
+from pytest import fixture
+from typing import List
+
+
+@fixture(params=SIZES, ids=size_id)
+def size(request) -> int:
+    return request.param
+
+
+def build_votes(count: int) -> List[GameFirstStage]:
+    """
+    Build the votes of the members of a game with a response already loaded, as create_first_stage returns it
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    owner = User(id=uuid.uuid4(), username='owner', created_at=now, updated_at=now)
+    game = Game(id=uuid.uuid4(), owner=owner, description='game', gender=None, created_at=now, updated_at=now)
+    users = [User(id=uuid.uuid4(), username=f'user-{i:03d}', created_at=now, updated_at=now) for i in range(count // 1000 + 1)]
+    names = [Name(id=uuid.uuid4(), value=f'Prénom-{i:06d}', gender='MF'[i % 2], created_at=now, updated_at=now) for i in range(1000)]
+
+    return [
+        GameFirstStage(id=uuid.uuid4(), game=game, user=users[i // 1000], name=names[i % 1000], choice=bool(i % 2), created_at=now, updated_at=now)
+        for i in range(count)
+    ]
+
+
+def test_game_first_stage(benchmark, size: int):
+    field = create_response_field(name='Response_create_first_stage', type_=List[GameFirstStageSchema])
+    votes = build_votes(size)
+
+    benchmark(pydantic_path, field, votes)
+
+
+def test_names_pydantic(benchmark, size: int):
+    field = create_response_field(name='Response_get_names', type_=List[NameSchema])
+    names = list(build_snapshot(size).list())
+
+    benchmark(pydantic_path, field, names)
+
+
+def test_names_fast(benchmark, size: int):
+    snapshot = build_snapshot(size)
+    names = list(snapshot.list())
+    encoder = NameEncoder()
+
+    benchmark(encoder.encode, names, snapshot)
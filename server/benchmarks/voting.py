@@ -0,0 +1,224 @@
+"""
+Load test of the voting workflow against a running server.
+
+It seeds users, games with guests and the names of data/prenoms.csv in the database configured
+by the DB_* environment variables, then each client votes as one of the users: it gets the next
+name of its game, posts a choice, and gets the result of the game every few votes. The users
+and games are removed when done, the imported names are kept. Use a dedicated database:
+
+    gunicorn main:app --config gunicorn.conf.py
+    python -m benchmarks.voting --url http://127.0.0.1:8000 --users 50 --games 10 --duration 30
+
+Results are appended to benchmarks/results/voting.jsonl with the current commit and compared
+with the previous run, or with the latest run of another commit given with --compare.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import requests
+import subprocess
+import threading
+import time
+import uuid
+
+from app.controllers.names import NameController
+from app.database import SessionLocal
+from app.models.games import Game, GameFirstStage, GameGuest
+from app.models.users import User
+from benchmarks import Timer, summarize
+from collections import defaultdict
+from sqlalchemy import insert, select
+from typing import Any, Dict, List, Optional, Tuple
+
+
+PREFIX = 'benchmark-'
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENDPOINTS = ['GET /stage-1/next', 'POST /stage-1', 'GET /stage-1/result']
+
+
+def seed(db, users_count: int, games_count: int, catalogue: str) -> List[Tuple[str, uuid.UUID]]:
+    """
+    Create the users and their games, and return the username and game of each user
+    """
+    with open(catalogue, encoding='utf-8-sig', newline='') as f:
+        NameController.import_names(db, f)
+
+    # Usernames are unique to the run: the server caches the identity of the users
+    run = uuid.uuid4().hex[:8]
+    users = [{'id': uuid.uuid4(), 'username': f'{PREFIX}{run}-{i:06d}'} for i in range(users_count)]
+    db.execute(insert(User), users)
+
+    # The first users own the games, the others are their guests
+    games = [{'id': uuid.uuid4(), 'owner_id': users[i]['id'], 'description': f'{PREFIX}voting'} for i in range(games_count)]
+    db.execute(insert(Game), games)
+
+    members = [(user['username'], games[i % games_count]['id']) for i, user in enumerate(users)]
+    guests = [{'game_id': games[i % games_count]['id'], 'user_id': user['id']} for i, user in enumerate(users) if i >= games_count]
+
+    if guests:
+        db.execute(insert(GameGuest), guests)
+
+    db.commit()
+    db.execute('ANALYZE')
+
+    return members
+
+
+def cleanup(db) -> None:
+    games = select(Game.id).where(Game.description == f'{PREFIX}voting')
+
+    db.query(GameFirstStage).filter(GameFirstStage.game_id.in_(games)).delete(synchronize_session=False)
+    db.query(GameGuest).filter(GameGuest.game_id.in_(games)).delete(synchronize_session=False)
+    db.query(Game).filter(Game.description == f'{PREFIX}voting').delete(synchronize_session=False)
+    db.query(User).filter(User.username.startswith(PREFIX)).delete(synchronize_session=False)
+    db.commit()
+
+
+def worker(url: str, auth_header: str, username: str, game_id: uuid.UUID, result_every: int, deadline: float, results: Dict[str, List[float]], lock: threading.Lock):
+    session = requests.Session()
+    session.headers[auth_header] = username
+    game_url = f'{url}/games/{game_id}'
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    votes = 0
+
+    def call(endpoint: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        try:
+            with Timer() as t:
+                r = session.request(method, game_url + path, **kwargs)
+        except requests.RequestException:
+            errors[endpoint] += 1
+            return None
+
+        durations[endpoint].append(t.elapsed)
+
+        if r.status_code >= 400:
+            errors[endpoint] += 1
+            return None
+
+        return r
+
+    while time.monotonic() < deadline:
+        r = call('GET /stage-1/next', 'GET', '/stage-1/next')
+
+        if r is None:
+            continue
+
+        name = r.json()
+
+        # Every name has been voted
+        if name is None:
+            break
+
+        call('POST /stage-1', 'POST', '/stage-1', json={'name_id': name['id'], 'choice': random.random() < 0.5})
+        votes += 1
+
+        if votes % result_every == 0:
+            call('GET /stage-1/result', 'GET', '/stage-1/result')
+
+    with lock:
+        for endpoint, values in durations.items():
+            results[endpoint].extend(values)
+        for endpoint, count in errors.items():
+            results[f'{endpoint} errors'].append(count)
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_runs(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_run(path: str, run: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Voting workflow load test')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server')
+    parser.add_argument('--auth-header', default='X-Remote-User', help='Name of the authentication header')
+    parser.add_argument('--users', type=int, default=50, help='Number of users, each one voting from a concurrent client')
+    parser.add_argument('--games', type=int, default=10, help='Number of games shared by the users')
+    parser.add_argument('--result-every', type=int, default=10, help='Number of votes between two results of a user')
+    parser.add_argument('--duration', type=float, default=30, help='Duration of the benchmark in seconds')
+    parser.add_argument('--catalogue', default=os.path.join(ROOT, 'data', 'prenoms.csv'), help='CSV file of the names')
+    parser.add_argument('--results', default=os.path.join(ROOT, 'server', 'benchmarks', 'results', 'voting.jsonl'), help='File storing the results of the runs')
+    parser.add_argument('--compare', help='Compare with the latest run of this commit instead of the previous run')
+    args = parser.parse_args()
+
+    if args.games > args.users:
+        parser.error('every game needs an owner, --games cannot exceed --users')
+
+    db = SessionLocal()
+    cleanup(db)
+    members = seed(db, args.users, args.games, args.catalogue)
+
+    try:
+        results = defaultdict(list)
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(
+                target=worker,
+                args=(args.url.rstrip('/'), args.auth_header, username, game_id, args.result_every, deadline, results, lock),
+            ) for username, game_id in members
+        ]
+
+        with Timer() as t:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        db.rollback()
+        cleanup(db)
+        db.close()
+
+    run = {
+        'commit': get_commit(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'parameters': {'users': args.users, 'games': args.games, 'result_every': args.result_every, 'duration': args.duration},
+        'endpoints': {
+            endpoint: {**summarize(results[endpoint], t.elapsed), 'errors': sum(results[f'{endpoint} errors'])} for endpoint in ENDPOINTS
+        },
+    }
+
+    runs = load_runs(args.results)
+    if args.compare:
+        previous = next((r for r in reversed(runs) if (r['commit'] or '').startswith(args.compare)), None)
+    else:
+        previous = runs[-1] if runs else None
+
+    save_run(args.results, run)
+
+    print(f'commit {run["commit"]}' + (f', compared with {previous["commit"]} of {previous["date"]}' if previous else ''))
+    print(f'{"endpoint":<22} {"requests":>9} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}')
+
+    for endpoint in ENDPOINTS:
+        s = run['endpoints'][endpoint]
+        print(f'{endpoint:<22} {s["requests"]:>9} {s["throughput"]:>9.1f} {s["p50"]:>9.1f} {s["p95"]:>9.1f} {s["p99"]:>9.1f} {s["errors"]:>7}')
+
+        if previous and endpoint in previous['endpoints']:
+            p = previous['endpoints'][endpoint]
+            deltas = [
+                f'{(s[key] - p[key]) / p[key] * 100:>+8.0f}%' if p[key] else f'{"-":>9}' for key in ['throughput', 'p50', 'p95', 'p99']
+            ]
+            print(f'{"  vs previous":<22} {"":>9} {" ".join(deltas)}')
+
+
+if __name__ == '__main__':
+    main()
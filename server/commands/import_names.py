@@ -0,0 +1,37 @@
+"""
+Import names from CSV files of "value,gender" lines into the database configured by the DB_*
+environment variables, skipping the names which already exist:
+
+    python -m commands.import_names ../data/prenoms.csv
+"""
+import argparse
+import time
+
+from app.controllers.names import NameController
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk name import')
+    parser.add_argument('files', nargs='+', help='CSV files to import')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+
+    try:
+        for path in args.files:
+            start = time.perf_counter()
+
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                result = NameController.import_names(db, f)
+
+            print(
+                f'{path}: {result.read} rows read, {result.inserted} inserted, {result.skipped} already existing, '
+                f'{result.duplicates} duplicates, {result.invalid} invalid in {time.perf_counter() - start:.2f}s'
+            )
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
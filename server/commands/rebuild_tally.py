@@ -0,0 +1,36 @@
+"""
+Recompute the first stage tallies of the database configured by the DB_* environment variables
+from the choices, for every game or for the given ones:
+
+    python -m commands.rebuild_tally
+    python -m commands.rebuild_tally 1f0c7a1e-0e9b-4a4c-9d43-2d5e1b0a7c11
+"""
+import argparse
+import time
+
+from app.controllers.games import GameController
+from app.database import SessionLocal
+from uuid import UUID
+
+
+def main():
+    parser = argparse.ArgumentParser(description='First stage tally rebuild')
+    parser.add_argument('games', nargs='*', type=UUID, help='Games to rebuild, all of them by default')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    start = time.perf_counter()
+
+    try:
+        if args.games:
+            count = sum(GameController.rebuild_first_stage_tally(db, game_id) for game_id in args.games)
+        else:
+            count = GameController.rebuild_first_stage_tally(db)
+    finally:
+        db.close()
+
+    print(f'{count} games rebuilt in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+
+
+# Gunicorn settings for production, read from the environment like main.py
+bind = os.getenv('APP_BIND', '127.0.0.1:8000')
+workers = int(os.getenv('APP_WORKERS', '1'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Workers which do not answer the arbiter within the timeout are killed and replaced
+timeout = int(os.getenv('APP_TIMEOUT', '30'))
+
+# On SIGTERM or SIGHUP, workers get this long to finish their current requests
+graceful_timeout = int(os.getenv('APP_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('APP_KEEPALIVE', '5'))
+
+# Restart workers after a number of requests, with jitter so they do not all restart at once
+max_requests = int(os.getenv('APP_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('APP_MAX_REQUESTS_JITTER', '0'))
+
+# The application is imported by each worker so every process opens its own connection pool,
+# sized by app.database from DB_MAX_CONNECTIONS and APP_WORKERS
+preload_app = False
+
+accesslog = None
+errorlog = '-'
+
+# Metrics of the workers are written to files in this directory and aggregated by /metrics
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'prenoms-metrics'))
+
+
+def on_starting(server):
+    # Counters start from zero with the server, but survive the reloads of the workers
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Drop the gauges of the workers which are gone
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,12 +2,25 @@ import logging
 import os
 
 from app import get_app
+from app.access_log import parse_sampling
 
 
 DEBUG = os.getenv('APP_DEBUG', 'false').lower() == 'true'
 PRODUCTION = os.getenv('APP_ENV', 'production') == 'production'
 PREFIX = os.getenv('APP_PREFIX', '')
 AUTH_HEADER = os.getenv('AUTH_HEADER_NAME', 'X-Remote-User')
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '1024'))
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', '60'))
+NAME_CATALOG_CHECK_INTERVAL = float(os.getenv('NAME_CATALOG_CHECK_INTERVAL', '1'))
+FAST_JSON = os.getenv('APP_FAST_JSON', 'false').lower() == 'true'
+NAMES_CACHE_MAX_AGE = int(os.getenv('NAMES_CACHE_MAX_AGE', '0'))
+BODY_MAX_SIZE = int(os.getenv('APP_BODY_MAX_SIZE', str(10 * 1024 * 1024)))
+METRICS = os.getenv('APP_METRICS', 'true').lower() == 'true'
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', '1'))
+ACCESS_LOG_SAMPLING = parse_sampling(os.getenv('ACCESS_LOG_SAMPLING', ''))
+SLOW_QUERY_THRESHOLD = float(os.getenv('DB_SLOW_QUERY_THRESHOLD', '0'))
+SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
+SLOW_QUERY_READERS = [username.strip() for username in os.getenv('DB_SLOW_QUERY_READERS', '').split(',') if username.strip()]
 
 logging.basicConfig(
     level=logging.DEBUG if DEBUG else logging.INFO
@@ -18,4 +31,16 @@ app = get_app(
     production=PRODUCTION,
     app_prefix=PREFIX,
     auth_header=AUTH_HEADER,
+    auth_cache_size=AUTH_CACHE_SIZE,
+    auth_cache_ttl=AUTH_CACHE_TTL,
+    name_catalog_check_interval=NAME_CATALOG_CHECK_INTERVAL,
+    fast_json=FAST_JSON,
+    names_cache_max_age=NAMES_CACHE_MAX_AGE,
+    body_max_size=BODY_MAX_SIZE,
+    metrics=METRICS,
+    access_log_sample_rate=ACCESS_LOG_SAMPLE_RATE,
+    access_log_sampling=ACCESS_LOG_SAMPLING,
+    slow_query_threshold=SLOW_QUERY_THRESHOLD,
+    slow_query_explain=SLOW_QUERY_EXPLAIN,
+    slow_query_readers=SLOW_QUERY_READERS,
 )
@@ -1,10 +1,13 @@
+from .budgets import STATEMENT_BUDGETS, StatementBudgetMiddleware
 from app import get_app
-from app.database import SessionLocal
+from app.catalog import CatalogName
+from app.database import SessionLocal, engine
 from app.models import Base
 from datetime import datetime
 from fastapi.testclient import TestClient
 from pytest import fixture
-from typing import Any
+from sqlalchemy import event
+from typing import Any, List
 from uuid import UUID
 
 
@@ -25,6 +28,8 @@ def serialize_value(value: Any) -> str:
                 )
             )
         })
+    elif isinstance(value, CatalogName):
+        return serialize_value(value._asdict())
     elif isinstance(value, datetime):
         return value.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
     elif isinstance(value, UUID):
@@ -41,6 +46,9 @@ def client():
         production=False,
     )
 
+    # Check the number of SQL statements of each request
+    app.add_middleware(StatementBudgetMiddleware, routes=app.routes, budgets=STATEMENT_BUDGETS)
+
     # Return the test client
     yield TestClient(app)
 
@@ -58,3 +66,21 @@ def database():
 
         # Close the connection
         db.close()
+
+
+@fixture
+def statements() -> List[str]:
+    """
+    Collect the SQL statements sent to the database
+    """
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+
+    try:
+        yield executed
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
@@ -4,15 +4,18 @@ from .. import database
 from ..fixtures import user
 from app.auth import configure_auth, get_auth
 from app.auth.remote import RemoteAuth
+from app.controllers.users import UserController
 from app.models.users import User
 from fastapi import HTTPException
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 
 
 def test_get_user_from_request_header(database: Session, user: User):
     header_name = 'user-header'
     request = MagicMock()
+    request.method = 'GET'
     request.headers.get.side_effect = lambda x: user.username if x == header_name else None
     assert request.headers.get(header_name) == user.username
     assert request.headers.get('bad-header') == None
@@ -28,3 +31,44 @@ def test_get_user_from_request_header(database: Session, user: User):
     auth = get_auth()
     with pytest.raises(HTTPException):
         auth.get_user(request, database)
+
+def test_get_user_from_cache(database: Session, user: User):
+    header_name = 'user-header'
+    request = MagicMock()
+    request.method = 'GET'
+    request.headers.get.side_effect = lambda x: user.username if x == header_name else None
+
+    configure_auth(RemoteAuth, header_name=header_name)
+    auth = get_auth()
+
+    # First request fills the cache
+    result = auth.get_user(request, database)
+    assert result.id == user.id
+    assert auth.cache.stats()['misses'] == 1
+
+    # Next requests do not query the database
+    with patch('app.auth.remote.UserController.get_or_create_user') as get_or_create_user:
+        result = auth.get_user(request, database)
+
+    get_or_create_user.assert_not_called()
+    assert result.id == user.id
+    assert result.username == user.username
+    assert result.created_at == user.created_at
+    assert result.updated_at == user.updated_at
+    assert auth.cache.stats()['hits'] == 1
+    assert inspect(result).detached
+
+    # Writes check the user in the database
+    request.method = 'POST'
+    with patch('app.auth.remote.UserController.get_or_create_user', wraps=UserController.get_or_create_user) as get_or_create_user:
+        result = auth.get_user(request, database)
+
+    get_or_create_user.assert_called_once()
+    assert result.id == user.id
+    request.method = 'GET'
+
+    # Deleting the user invalidates the cache
+    UserController.delete_user(database, user.id)
+    result = auth.get_user(request, database)
+    assert result.id != user.id
+    assert auth.cache.stats()['misses'] == 2
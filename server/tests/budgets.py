@@ -0,0 +1,120 @@
+from app.database import engine
+from app.metrics import get_route_path
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Dict, List, Optional, Tuple
+
+
+# Maximum number of SQL statements per request, including the authentication of the user,
+# which is checked in the database by every write
+STATEMENT_BUDGETS: Dict[Tuple[str, str], int] = {
+    ('GET', '/health'): 1,
+    ('GET', '/health/pool'): 0,
+    ('GET', '/health/slow-queries'): 1,
+    ('GET', '/me'): 1,
+    ('GET', '/metrics'): 0,
+    ('GET', '/users'): 2,
+    ('GET', '/users/{user_id}'): 2,
+    ('DELETE', '/users/{user_id}'): 4,
+    ('GET', '/names'): 3,
+    ('GET', '/names/search'): 3,
+    ('POST', '/names'): 4,
+    ('POST', '/names/bulk'): 3,
+    ('DELETE', '/names/{name_id}'): 2,
+    ('GET', '/games'): 2,
+    ('POST', '/games'): 3,
+    ('PUT', '/games/{game_id}'): 4,
+    ('DELETE', '/games/{game_id}'): 4,
+    ('GET', '/games/{game_id}/guests'): 3,
+    ('POST', '/games/{game_id}/guests'): 5,
+    ('DELETE', '/games/{game_id}/guests/{user_id}'): 5,
+    ('POST', '/games/{game_id}/stage-1'): 5,
+    ('POST', '/games/{game_id}/stage-1/batch'): 4,
+    ('GET', '/games/{game_id}/stage-1/votes'): 3,
+    ('GET', '/games/{game_id}/stage-1/next'): 6,
+    ('GET', '/games/{game_id}/stage-1/next-names'): 6,
+    ('GET', '/games/{game_id}/stage-1/result'): 3,
+}
+
+# Maximum number of executions of a same statement per request
+REPEAT_LIMIT = 2
+
+_statements: ContextVar[Optional[List[str]]] = ContextVar('statements', default=None)
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+
+    if statements is not None:
+        statements.append(statement)
+
+
+class StatementBudgetExceeded(AssertionError):
+    def __init__(self, method: str, path: str, budget: int, statements: List[str]):
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.statements = statements
+
+        super().__init__(
+            '{} {} executed {} SQL statements, budget is {}:\n{}'.format(
+                method, path, len(statements), budget, '\n'.join(f'  {s}' for s in statements)
+            )
+        )
+
+
+class RepeatedStatement(AssertionError):
+    def __init__(self, method: str, path: str, statement: str, count: int):
+        self.method = method
+        self.path = path
+        self.statement = statement
+        self.count = count
+
+        super().__init__(f'{method} {path} executed the same SQL statement {count} times, this looks like a N+1 query:\n  {statement}')
+
+
+class StatementBudgetMiddleware:
+    """
+    Fail requests executing more SQL statements than the budget of their route, or
+    executing the same statement too many times
+    """
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute], budgets: Dict[Tuple[str, str], int], repeat_limit: int = REPEAT_LIMIT) -> None:
+        self.app = app
+        self.routes = routes
+        self.budgets = budgets
+        self.repeat_limit = repeat_limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        statements = []
+        token = _statements.set(statements)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _statements.reset(token)
+
+        path = get_route_path(self.routes, scope)
+
+        if path is None:
+            return
+
+        budget = self.budgets.get((scope['method'], path))
+
+        if budget is None:
+            raise AssertionError(f'No SQL statement budget declared for {scope["method"]} {path}')
+
+        if len(statements) > budget:
+            raise StatementBudgetExceeded(scope['method'], path, budget, statements)
+
+        # The same statement executed again and again is usually a lazy load in a loop
+        for statement, count in Counter(statements).items():
+            if count > self.repeat_limit:
+                raise RepeatedStatement(scope['method'], path, statement, count)
@@ -1,4 +1,6 @@
 import pytest
+import threading
+import time
 
 from .. import database, serialize_value
 from ..fixtures import user
@@ -6,10 +8,13 @@ from ..test_data.games import insert_game, insert_game_guest, insert_first_stage
 from ..test_data.names import insert_name
 from ..test_data.users import insert_user
 from app.controllers.games import GameController
+from app.controllers.names import NameController
 from app.exceptions import AlreadyExists
-from app.models.games import Game, GameFirstStage
+from app.database import engine
+from app.models.games import Game, GameFirstStage, GameGuest, game_name_tally
 from app.models.users import User
-from app.schemas.games import GameCreate, GameUpdate, GameFirstStageCreate
+from app.schemas.games import GameCreate, GameUpdate, GameFirstStageCreate, GameFirstStageBatchStatus
+from sqlalchemy import delete, insert, select, text, update
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound
 from uuid import UUID
@@ -49,6 +54,24 @@ def test_get_games(database: Session):
     assert len(result) == 1
     assert result == [game]
 
+def test_get_games_paginated(database: Session, user: User):
+    guest = insert_user(database, username='guest')
+    games = list(insert_game(database, user) for i in range(5))
+    owner_only = games[0]
+
+    for game in games[1:]:
+        insert_game_guest(database, game, guest)
+
+    games.sort(key=lambda game: (game.created_at, game.id))
+
+    assert GameController.get_games(database, limit=2) == games[0:2]
+    assert GameController.get_games(database, limit=2, after=(games[1].created_at, games[1].id)) == games[2:4]
+    assert GameController.get_games(database, after=(games[3].created_at, games[3].id)) == games[4:]
+
+    # As a guest
+    guest_games = list(game for game in games if game.id != owner_only.id)
+    assert GameController.get_games(database, guest, limit=3) == guest_games[0:3]
+
 def test_get_game(database: Session):
     # Data
     user = insert_user(database)
@@ -322,21 +345,21 @@ def test_get_first_stage_next(database: Session, user: User):
         GameController.get_first_stage_next(database, game_X.id, other)
 
     # Get next with defined gender as owner
-    assert GameController.get_first_stage_next(database, game_M.id, user) == name_M
-    assert GameController.get_first_stage_next(database, game_F.id, user) == name_F
+    assert serialize_value(GameController.get_first_stage_next(database, game_M.id, user)) == serialize_value(name_M)
+    assert serialize_value(GameController.get_first_stage_next(database, game_F.id, user)) == serialize_value(name_F)
 
     # Get next with defined gender as guest
-    assert GameController.get_first_stage_next(database, game_M.id, guest) == name_M
-    assert GameController.get_first_stage_next(database, game_F.id, guest) == name_F
+    assert serialize_value(GameController.get_first_stage_next(database, game_M.id, guest)) == serialize_value(name_M)
+    assert serialize_value(GameController.get_first_stage_next(database, game_F.id, guest)) == serialize_value(name_F)
 
     # Check no remaining name once user has pushed a vote
     insert_first_stage(database, game_M, user, name_M, choice=True)
     assert GameController.get_first_stage_next(database, game_M.id, user) == None
-    assert GameController.get_first_stage_next(database, game_M.id, guest) == name_M
+    assert serialize_value(GameController.get_first_stage_next(database, game_M.id, guest)) == serialize_value(name_M)
 
     # Check without gender restriction
     insert_first_stage(database, game_X, user, name_M, choice=True)
-    assert GameController.get_first_stage_next(database, game_X.id, user) == name_F
+    assert serialize_value(GameController.get_first_stage_next(database, game_X.id, user)) == serialize_value(name_F)
 
 def test_get_first_stage_result(database: Session, user: User):
     # Create two users
@@ -373,4 +396,239 @@ def test_get_first_stage_result(database: Session, user: User):
 
     # Get result with all users
     for u in users:
-        assert GameController.get_first_stage_result(database, game.id, u) == [match_name]
+        assert serialize_value(GameController.get_first_stage_result(database, game.id, u)) == serialize_value([match_name])
+
+def test_get_first_stage_result_follows_members(database: Session, user: User):
+    guest = insert_user(database, username='guest')
+    game = insert_game(database, user)
+    name = insert_name(database, value='name')
+
+    # Only the owner is a member
+    insert_first_stage(database, game, user, name, choice=True)
+    assert serialize_value(GameController.get_first_stage_result(database, game.id, user)) == serialize_value([name])
+
+    # A new guest who did not vote yet
+    GameController.create_game_guest(database, game.id, guest.id, user)
+    assert GameController.get_first_stage_result(database, game.id, user) == []
+
+    insert_first_stage(database, game, guest, name, choice=True)
+    assert serialize_value(GameController.get_first_stage_result(database, game.id, user)) == serialize_value([name])
+
+    # A removed guest does not count anymore
+    GameController.delete_game_guest(database, game.id, guest.id, user)
+    assert serialize_value(GameController.get_first_stage_result(database, game.id, user)) == serialize_value([name])
+
+    # The choices of a re-invited guest count again
+    GameController.create_game_guest(database, game.id, guest.id, user)
+    assert serialize_value(GameController.get_first_stage_result(database, game.id, user)) == serialize_value([name])
+
+    # A changed choice
+    database.query(GameFirstStage).filter(GameFirstStage.user_id == guest.id).update({'choice': False})
+    assert GameController.get_first_stage_result(database, game.id, user) == []
+
+def test_check_game_access(database: Session, user: User):
+    guest = insert_user(database, username='guest')
+    game = insert_game(database, user)
+    insert_game_guest(database, game, guest)
+
+    # Unknown game or user
+    with pytest.raises(NoResultFound):
+        GameController.check_game_access(database, UUID('00000000-0000-0000-0000-000000000000'), user)
+
+    with pytest.raises(NoResultFound):
+        GameController.check_game_access(database, game.id, insert_user(database, username='other'))
+
+    # Owner and guest
+    GameController.check_game_access(database, game.id, user)
+    GameController.check_game_access(database, game.id, guest)
+
+    # A removed guest loses the access memoized in the session
+    GameController.delete_game_guest(database, game.id, guest.id, user)
+
+    with pytest.raises(NoResultFound):
+        GameController.get_game(database, game.id, guest)
+
+    GameController.check_game_access(database, game.id, user)
+
+def test_create_first_stages(database: Session, user: User):
+    names = list(insert_name(database, value=f'name-{i}') for i in range(1, 4))
+    unknown_id = UUID('00000000-0000-0000-0000-000000000000')
+
+    game = insert_game(database, user)
+
+    other = insert_user(database, username='other')
+
+    insert_first_stage(database, game, user, names[0], choice=False)
+
+    # Insert as other
+    with pytest.raises(NoResultFound):
+        GameController.create_first_stages(database, game.id, [GameFirstStageCreate(name_id=names[1].id, choice=True)], other)
+
+    # Insert to an unknown game
+    with pytest.raises(NoResultFound):
+        GameController.create_first_stages(database, unknown_id, [GameFirstStageCreate(name_id=names[1].id, choice=True)], user)
+
+    # Insert as user
+    result = GameController.create_first_stages(database, game.id, [
+        GameFirstStageCreate(name_id=names[0].id, choice=True),
+        GameFirstStageCreate(name_id=names[1].id, choice=True),
+        GameFirstStageCreate(name_id=unknown_id, choice=True),
+        GameFirstStageCreate(name_id=names[2].id, choice=False),
+        GameFirstStageCreate(name_id=names[1].id, choice=False),
+    ], user)
+    assert [(r.name_id, r.status) for r in result] == [
+        (names[0].id, GameFirstStageBatchStatus.already_exists),
+        (names[1].id, GameFirstStageBatchStatus.created),
+        (unknown_id, GameFirstStageBatchStatus.unknown_name),
+        (names[2].id, GameFirstStageBatchStatus.created),
+        (names[1].id, GameFirstStageBatchStatus.already_exists),
+    ]
+
+    choices = database.query(GameFirstStage).filter(GameFirstStage.game_id == game.id).order_by(GameFirstStage.created_at).all()
+    assert [(c.name_id, c.choice) for c in choices] == [
+        (names[0].id, False),
+        (names[1].id, True),
+        (names[2].id, False),
+    ]
+
+def test_get_first_stage_next_names(database: Session, user: User):
+    game = insert_game(database, user)
+    names = list(insert_name(database, value=f'name-{i}') for i in range(1, 6))
+
+    other = insert_user(database, username='other')
+
+    # Get next names as other
+    with pytest.raises(NoResultFound):
+        GameController.get_first_stage_next_names(database, game.id, other, 2)
+
+    # Names are ordered by value
+    assert serialize_value(GameController.get_first_stage_next_names(database, game.id, user, 2)) == serialize_value(names[0:2])
+    assert serialize_value(GameController.get_first_stage_next_names(database, game.id, user, 10)) == serialize_value(names)
+
+    # Start after a known name
+    assert serialize_value(GameController.get_first_stage_next_names(database, game.id, user, 2, after=(names[1].value, names[1].id))) == serialize_value(names[2:4])
+
+    # Voted names are excluded
+    insert_first_stage(database, game, user, names[2], choice=True)
+    assert serialize_value(GameController.get_first_stage_next_names(database, game.id, user, 2, after=(names[1].value, names[1].id))) == serialize_value(names[3:5])
+    assert GameController.get_first_stage_next_names(database, game.id, user, 2, after=(names[4].value, names[4].id)) == []
+
+    # Start after a deleted name
+    deleted = insert_name(database, value='name-2-deleted')
+    after = (deleted.value, deleted.id)
+    NameController.delete_name(database, deleted.id)
+    assert serialize_value(GameController.get_first_stage_next_names(database, game.id, user, 2, after=after)) == serialize_value(names[3:5])
+
+
+def get_yes_count(database: Session, game: Game, name) -> int:
+    database.commit()
+    return database.execute(
+        select(game_name_tally.c.yes_count).where(game_name_tally.c.game_id == game.id, game_name_tally.c.name_id == name.id)
+    ).scalar() or 0
+
+
+def run_blocked(database: Session, statement, pending) -> None:
+    """
+    Execute a statement in another transaction, check it waits for the pending transaction, then commit both
+    """
+    with engine.connect() as connection:
+        pid = connection.execute(text('SELECT pg_backend_pid()')).scalar()
+        transaction = connection.begin()
+        thread = threading.Thread(target=connection.execute, args=(statement,))
+        thread.start()
+
+        try:
+            for _ in range(500):
+                if database.execute(text('SELECT EXISTS (SELECT 1 FROM pg_locks WHERE pid = :pid AND NOT granted)'), {'pid': pid}).scalar():
+                    break
+                time.sleep(0.01)
+            else:
+                raise AssertionError('the statement did not wait for the pending transaction')
+        finally:
+            database.commit()
+            pending.commit()
+            thread.join()
+
+        transaction.commit()
+
+
+def test_first_stage_tally_guest_removed_while_voting(database: Session):
+    owner = insert_user(database, username='owner')
+    guest = insert_user(database, username='guest')
+    game = insert_game(database, owner)
+    insert_game_guest(database, game, guest)
+    name = insert_name(database, value='Alice', gender='F')
+
+    # The guest votes while being removed from the game
+    with engine.connect() as connection:
+        vote = connection.begin()
+        connection.execute(insert(GameFirstStage).values(game_id=game.id, user_id=guest.id, name_id=name.id, choice=True))
+
+        run_blocked(database, delete(GameGuest).where(GameGuest.game_id == game.id, GameGuest.user_id == guest.id), vote)
+
+    # The choice of a former guest is not counted
+    assert get_yes_count(database, game, name) == 0
+
+
+def test_first_stage_tally_guest_added_while_voting(database: Session):
+    owner = insert_user(database, username='owner')
+    guest = insert_user(database, username='guest')
+    game = insert_game(database, owner)
+    name = insert_name(database, value='Alice', gender='F')
+
+    # The user votes while being added to the game
+    with engine.connect() as connection:
+        vote = connection.begin()
+        connection.execute(insert(GameFirstStage).values(game_id=game.id, user_id=guest.id, name_id=name.id, choice=True))
+
+        run_blocked(database, insert(GameGuest).values(game_id=game.id, user_id=guest.id), vote)
+
+    # The choice of the new guest is counted
+    assert get_yes_count(database, game, name) == 1
+
+
+def test_first_stage_tally_vote_while_game_updated(database: Session):
+    owner = insert_user(database, username='owner')
+    game = insert_game(database, owner)
+    name = insert_name(database, value='Alice', gender='F')
+
+    # The owner votes while the game is being updated
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(update(Game).where(Game.id == game.id).values(description='Updated'))
+
+        try:
+            # Fails instead of waiting for the update
+            database.execute(text("SET LOCAL lock_timeout = '1s'"))
+            database.execute(insert(GameFirstStage).values(game_id=game.id, user_id=owner.id, name_id=name.id, choice=True))
+            database.commit()
+        finally:
+            transaction.commit()
+
+    assert get_yes_count(database, game, name) == 1
+
+
+def test_rebuild_first_stage_tally(database: Session):
+    owner = insert_user(database, username='owner')
+    guest = insert_user(database, username='guest')
+    other = insert_user(database, username='other')
+    game = insert_game(database, owner)
+    insert_game_guest(database, game, guest)
+    alice = insert_name(database, value='Alice', gender='F')
+    bob = insert_name(database, value='Bob', gender='M')
+
+    insert_first_stage(database, game, owner, alice, True)
+    insert_first_stage(database, game, guest, alice, True)
+    insert_first_stage(database, game, other, alice, True)
+    insert_first_stage(database, game, owner, bob, False)
+
+    # Drifted tally
+    database.execute(update(game_name_tally).where(game_name_tally.c.game_id == game.id).values(yes_count=5))
+    database.commit()
+
+    assert GameController.rebuild_first_stage_tally(database, game.id) == 1
+    assert get_yes_count(database, game, alice) == 2
+    assert get_yes_count(database, game, bob) == 0
+
+    assert GameController.rebuild_first_stage_tally(database) == 1
+    assert get_yes_count(database, game, alice) == 2
@@ -1,6 +1,6 @@
 from .. import database
 from app.controllers.health import HealthController
-from app.schemas.health import HealthStatus
+from app.schemas.health import HealthStatus, PoolStatus
 from sqlalchemy.orm import Session
 from unittest.mock import MagicMock
 
@@ -16,3 +16,9 @@ def test_get_error_health(database: Session):
     result = HealthController.health(database)
     assert isinstance(result, HealthStatus)
     assert result == HealthStatus.error
+
+def test_pool_status():
+    result = HealthController.pool_status()
+    assert isinstance(result, PoolStatus)
+    assert result.size == 5
+    assert result.checked_out >= 0
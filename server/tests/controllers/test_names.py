@@ -1,14 +1,16 @@
 import pytest
 
-from .. import database
+from .. import database, serialize_value
 from ..fixtures import name
 from ..test_data.names import insert_name
+from app.catalog import name_catalog
 from app.controllers.names import NameController
 from app.exceptions import AlreadyExists
 from app.models.names import Name
 from app.schemas.names import NameCreate
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound
+from unittest.mock import patch
 from uuid import UUID
 
 
@@ -26,18 +28,86 @@ def test_get_names(database: Session):
     result = NameController.get_names(database)
     assert isinstance(result, list)
     assert len(result) == 2
-    assert result == [female, male]
+    assert serialize_value(result) == serialize_value([female, male])
 
     # Only males
     result = NameController.get_names(database, 'M')
     assert isinstance(result, list)
     assert len(result) == 1
-    assert result == [male]
+    assert serialize_value(result) == serialize_value([male])
+
+def test_get_names_paginated(database: Session):
+    names = list(insert_name(database, value=f'name-{i}', gender='MF'[i % 2]) for i in range(5))
+
+    # First page, then the following ones
+    assert serialize_value(NameController.get_names(database, limit=2)) == serialize_value(names[0:2])
+    assert serialize_value(NameController.get_names(database, limit=2, after=(names[1].value, names[1].id))) == serialize_value(names[2:4])
+    assert serialize_value(NameController.get_names(database, after=(names[3].value, names[3].id))) == serialize_value(names[4:])
+    assert NameController.get_names(database, limit=2, after=(names[4].value, names[4].id)) == []
+
+    # With a gender
+    assert serialize_value(NameController.get_names(database, 'M', limit=2, after=(names[0].value, names[0].id))) == serialize_value([names[2], names[4]])
+
+    # After a deleted name
+    after = (names[1].value, names[1].id)
+    NameController.delete_name(database, names[1].id)
+    assert serialize_value(NameController.get_names(database, limit=1, after=after)) == serialize_value(names[2:3])
+
+def test_get_names_from_snapshot(database: Session):
+    female = insert_name(database, value='Female', gender='F')
+    snapshot = name_catalog.snapshot(database)
+    insert_name(database, value='Male', gender='M')
+
+    # The names of the given snapshot, not the ones of the reloaded catalog
+    assert serialize_value(NameController.get_names(database, snapshot=snapshot)) == serialize_value([female])
+    assert len(NameController.get_names(database)) == 2
+
+def test_import_names(database: Session):
+    existing = insert_name(database, value='Zoé', gender='F')
+
+    lines = [
+        'Zoé,F',
+        'Léa,F',
+        ' Léa , f ',
+        'Le\u0301a,F',
+        'Jean  Pierre,M',
+        '',
+        'Invalid,T',
+        ',M',
+        'Too,many,columns',
+    ]
+
+    result = NameController.import_names(database, lines)
+    assert result.read == 8
+    assert result.invalid == 3
+    assert result.duplicates == 2
+    assert result.inserted == 2
+    assert result.skipped == 1
+
+    names = NameController.get_names(database)
+    assert list((n.value, n.gender) for n in names) == [('Jean Pierre', 'M'), ('Léa', 'F'), ('Zoé', 'F')]
+    assert names[2].id == existing.id
+
+    # Importing again inserts nothing
+    result = NameController.import_names(database, lines)
+    assert result.inserted == 0
+    assert result.skipped == 3
+
+def test_import_names_by_chunks(database: Session):
+    lines = [f'name-{i:03d},{"MF"[i % 2]}\n' for i in range(100)]
+
+    # A COPY every few names
+    with patch('app.controllers.names.IMPORT_CHUNK_SIZE', 50):
+        result = NameController.import_names(database, lines + lines[:10])
+
+    assert result.inserted == 100
+    assert result.duplicates == 10
+    assert list(n.value for n in NameController.get_names(database)) == [f'name-{i:03d}' for i in range(100)]
 
 def test_get_user(database: Session, name: Name):
     # Correct result
     result = NameController.get_name(database, name.id)
-    assert result == name
+    assert serialize_value(result) == serialize_value(name)
 
     # Not found
     with pytest.raises(NoResultFound):
@@ -23,6 +23,14 @@ def test_get_users(database: Session, user: User):
     assert result[0].id == user.id
     assert result[0].username == user.username
 
+def test_get_users_paginated(database: Session):
+    users = list(UserController.create_user(database, UserCreate(username=f'user-{i}')) for i in range(5))
+
+    assert UserController.get_users(database, limit=2) == users[0:2]
+    assert UserController.get_users(database, limit=2, after=users[1].username) == users[2:4]
+    assert UserController.get_users(database, after=users[3].username) == users[4:]
+    assert UserController.get_users(database, limit=2, after=users[4].username) == []
+
 def test_get_user_not_found(database):
     with pytest.raises(NoResultFound):
         UserController.get_user(database, UUID('00000000-0000-0000-0000-000000000000'))
@@ -60,3 +68,10 @@ def test_get_or_create_user(database: Session, user: User):
     result = UserController.get_or_create_user(database, 'admin')
     assert result.id is not None
     assert result.username == 'admin'
+
+def test_get_or_create_user_does_not_update_existing(database: Session, user: User):
+    result = UserController.get_or_create_user(database, user.username)
+    assert result.id == user.id
+    assert result.created_at == user.created_at
+    assert result.updated_at == user.updated_at
+    assert len(UserController.get_users(database)) == 1
@@ -1,4 +1,6 @@
-from .. import client, database, serialize_value
+import json
+
+from .. import client, database, serialize_value, statements
 from ..fixtures import name, user
 from ..test_data.games import insert_first_stage, insert_game, insert_game_guest
 from ..test_data.names import insert_name
@@ -7,6 +9,7 @@ from app.models.names import Name
 from app.models.users import User
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from typing import List
 
 
 def test_get_games_list(client: TestClient, database: Session):
@@ -64,6 +67,23 @@ def test_get_games_list(client: TestClient, database: Session):
     assert r.status_code == 200
     assert r.json() == []
 
+def test_get_games_list_paginated(client: TestClient, database: Session):
+    owner = insert_user(database, username='owner')
+    games = list(insert_game(database, owner) for i in range(3))
+    headers = { 'X-Remote-User': owner.username }
+
+    r = client.get('/games?limit=2', headers=headers)
+    assert r.status_code == 200
+    assert list(g['id'] for g in r.json()) == list(serialize_value(g.id) for g in games[0:2])
+
+    r = client.get('/games', params={ 'limit': 2, 'after': r.headers['X-Next-Cursor'] }, headers=headers)
+    assert r.status_code == 200
+    assert list(g['id'] for g in r.json()) == list(serialize_value(g.id) for g in games[2:])
+    assert 'X-Next-Cursor' not in r.headers
+
+    r = client.get('/games?after=invalid', headers=headers)
+    assert r.status_code == 422
+
 def test_create_game(client: TestClient):
     # Without authentication
     r = client.post('/games', json={})
@@ -305,6 +325,44 @@ def test_create_first_stage(client: TestClient, database: Session, user: User, n
     r = client.post('/games/00000000-0000-0000-0000-000000000000/stage-1', headers={ 'X-Remote-User': user.username }, json={ 'name_id': serialize_value(name.id), 'choice': True })
     assert r.status_code == 404
 
+def test_create_first_stages(client: TestClient, database: Session, user: User, name: Name):
+    game = insert_game(database, user)
+    payload = [
+        { 'name_id': serialize_value(name.id), 'choice': True },
+        { 'name_id': '00000000-0000-0000-0000-000000000000', 'choice': True },
+    ]
+
+    # Create choices without authent
+    r = client.post(f'/games/{game.id}/stage-1/batch', json=payload)
+    assert r.status_code == 401
+
+    # Create choices as other
+    r = client.post(f'/games/{game.id}/stage-1/batch', headers={ 'X-Remote-User': 'other' }, json=payload)
+    assert r.status_code == 404
+
+    # Create choices as user
+    r = client.post(f'/games/{game.id}/stage-1/batch', headers={ 'X-Remote-User': user.username }, json=payload)
+    assert r.status_code == 200
+    assert r.json() == [
+        { 'name_id': serialize_value(name.id), 'status': 'created' },
+        { 'name_id': '00000000-0000-0000-0000-000000000000', 'status': 'unknown_name' },
+    ]
+
+    # Create choices as user again
+    r = client.post(f'/games/{game.id}/stage-1/batch', headers={ 'X-Remote-User': user.username }, json=payload[0:1])
+    assert r.status_code == 200
+    assert r.json() == [
+        { 'name_id': serialize_value(name.id), 'status': 'already_exists' },
+    ]
+
+    # Empty batch
+    r = client.post(f'/games/{game.id}/stage-1/batch', headers={ 'X-Remote-User': user.username }, json=[])
+    assert r.status_code == 422
+
+    # Create choices to an unknown game
+    r = client.post('/games/00000000-0000-0000-0000-000000000000/stage-1/batch', headers={ 'X-Remote-User': user.username }, json=payload)
+    assert r.status_code == 404
+
 def test_get_first_stage_next(client: TestClient, database: Session, user: User, name: Name):
     game = insert_game(database, user)
 
@@ -321,10 +379,56 @@ def test_get_first_stage_next(client: TestClient, database: Session, user: User,
     assert r.status_code == 200
     assert r.json() == serialize_value(name)
 
+    # No more names
+    insert_first_stage(database, game, user, name, choice=True)
+    r = client.get(f'/games/{game.id}/stage-1/next', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 200
+    assert r.json() == None
+
     # Unknown game
     r = client.get('/games/00000000-0000-0000-0000-000000000000/stage-1/next', headers={ 'X-Remote-User': user.username })
     assert r.status_code == 404
 
+def test_get_first_stage_next_names(client: TestClient, database: Session, user: User):
+    game = insert_game(database, user)
+    names = list(insert_name(database, value=f'name-{i}') for i in range(1, 6))
+
+    # As other
+    r = client.get(f'/games/{game.id}/stage-1/next-names?count=2', headers={ 'X-Remote-User': 'other' })
+    assert r.status_code == 404
+
+    # First page
+    r = client.get(f'/games/{game.id}/stage-1/next-names?count=2', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 200
+    assert r.json() == serialize_value(names[0:2])
+
+    # Next page
+    r = client.get(f'/games/{game.id}/stage-1/next-names?count=2&after={r.headers["X-Next-Cursor"]}', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 200
+    assert r.json() == serialize_value(names[2:4])
+
+    # Last page
+    r = client.get(f'/games/{game.id}/stage-1/next-names?count=2&after={r.headers["X-Next-Cursor"]}', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 200
+    assert r.json() == serialize_value(names[4:5])
+
+    # No more names
+    r = client.get(f'/games/{game.id}/stage-1/next-names?count=2&after={r.headers["X-Next-Cursor"]}', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 200
+    assert r.json() == []
+    assert 'X-Next-Cursor' not in r.headers
+
+    # Invalid cursor
+    r = client.get(f'/games/{game.id}/stage-1/next-names?count=2&after=invalid', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 422
+
+    # Invalid or missing count
+    r = client.get(f'/games/{game.id}/stage-1/next-names?count=0', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 422
+
+    r = client.get(f'/games/{game.id}/stage-1/next-names', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 422
+
 def test_get_first_stage_result(client: TestClient, database: Session):
     users = list(
         insert_user(database, username=f'user-{i}') for i in range(1, 3)
@@ -363,3 +467,88 @@ def test_get_first_stage_result(client: TestClient, database: Session):
     r = client.get(f'/games/{game.id}/stage-1/result', headers={ 'X-Remote-User': users[0].username })
     assert r.status_code == 200
     assert r.json() == serialize_value([match_name])
+
+
+def test_game_endpoints_statements(client: TestClient, database: Session, statements: List[str]):
+    owner = insert_user(database, username='owner')
+    guest = insert_user(database, username='guest')
+    name = insert_name(database, value='name')
+    game = insert_game(database, owner)
+    headers = { 'X-Remote-User': owner.username }
+
+    # Authenticate the user before counting
+    client.get('/me', headers=headers)
+
+    # Method, path, payload and expected number of statements, writes checking the user
+    requests = [
+        ('GET', f'/games/{game.id}/guests', None, 2),
+        ('POST', f'/games/{game.id}/guests', { 'user_id': str(guest.id) }, 5),
+        ('DELETE', f'/games/{game.id}/guests/{guest.id}', None, 5),
+        ('POST', f'/games/{game.id}/stage-1', { 'name_id': str(name.id), 'choice': True }, 5),
+        ('PUT', f'/games/{game.id}', { 'description': 'Updated', 'gender': None }, 4),
+        ('GET', f'/games/{game.id}/stage-1/result', None, 2),
+    ]
+
+    for method, path, payload, count in requests:
+        statements.clear()
+
+        r = client.request(method, path, json=payload, headers=headers)
+        assert r.status_code < 300
+        assert len(statements) == count, f'{method} {path}'
+
+    # A single membership check per request
+    statements.clear()
+    client.post(f'/games/{game.id}/guests', json={ 'user_id': str(guest.id) }, headers=headers)
+    assert len(list(s for s in statements if 'EXISTS' in s)) == 1
+
+
+def test_get_games_list_statements(client: TestClient, database: Session, statements: List[str]):
+    guest = insert_user(database, username='guest')
+    headers = { 'X-Remote-User': guest.username }
+
+    # Authenticate the user before counting
+    client.get('/me', headers=headers)
+
+    # 200 games owned by 200 users
+    for i in range(200):
+        game = insert_game(database, insert_user(database, username=f'owner-{i}'))
+        insert_game_guest(database, game, guest)
+
+    statements.clear()
+
+    r = client.get('/games', headers=headers)
+    assert r.status_code == 200
+    assert len(r.json()) == 200
+    assert len(statements) == 1
+
+
+def test_get_first_stage_votes(client: TestClient, database: Session):
+    owner = insert_user(database, username='owner')
+    other = insert_user(database, username='other')
+    game = insert_game(database, owner)
+    names = list(insert_name(database, value=f'name-{i}') for i in range(3))
+    votes = list(insert_first_stage(database, game, owner, name, choice=bool(i % 2)) for i, name in enumerate(names))
+
+    expected = list(
+        {
+            'id': serialize_value(vote.id),
+            'created_at': serialize_value(vote.created_at),
+            'updated_at': serialize_value(vote.updated_at),
+            'user_id': serialize_value(owner.id),
+            'name_id': serialize_value(vote.name_id),
+            'choice': vote.choice,
+        } for vote in votes
+    )
+
+    r = client.get(f'/games/{game.id}/stage-1/votes', headers={ 'X-Remote-User': owner.username })
+    assert r.status_code == 200
+    assert r.json() == expected
+
+    r = client.get(f'/games/{game.id}/stage-1/votes?stream=1', headers={ 'X-Remote-User': owner.username })
+    assert r.status_code == 200
+    assert r.headers['content-type'] == 'application/x-ndjson'
+    assert list(json.loads(line) for line in r.text.splitlines()) == expected
+
+    # Not a member
+    r = client.get(f'/games/{game.id}/stage-1/votes?stream=1', headers={ 'X-Remote-User': other.username })
+    assert r.status_code == 404
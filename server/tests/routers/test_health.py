@@ -1,4 +1,8 @@
+import threading
+
 from .. import client
+from app.schemas.health import HealthStatus
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
 
@@ -11,7 +15,29 @@ def test_success_health(client: TestClient):
 def test_error_health(client: TestClient):
     session = MagicMock()
     session.side_effect = Exception
-    with patch('app.database.SessionLocal', return_value=session):
+    with patch('app.database.RequestSessionLocal', return_value=session):
         r = client.get('/health')
     assert r.status_code == 500
     assert r.json() == { 'status': 'error' }
+
+def test_pool_status(client: TestClient):
+    r = client.get('/health/pool')
+    assert r.status_code == 200
+    assert set(r.json().keys()) == { 'size', 'max_overflow', 'checked_in', 'checked_out', 'overflow' }
+
+def test_health_does_not_block_event_loop(client: TestClient):
+    # Both handlers must be running at the same time to pass the barrier, which is only
+    # possible if they do not block the event loop
+    barrier = threading.Barrier(2, timeout=5)
+
+    def blocking_health(db):
+        barrier.wait()
+        return HealthStatus.ok
+
+    # All the requests share the same event loop
+    with client, patch('app.controllers.health.HealthController.health', side_effect=blocking_health):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(lambda _: client.get('/health'), range(2)))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert not barrier.broken
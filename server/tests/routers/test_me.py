@@ -1,7 +1,10 @@
 from .. import client, database, serialize_value
 from ..fixtures import user
+from app.controllers.users import UserController
 from app.models.users import User
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
 
 
 def test_get_profile(client: TestClient, user: User):
@@ -17,3 +20,14 @@ def test_get_profile(client: TestClient, user: User):
 def test_get_profile_without_authent(client: TestClient):
     r = client.get('/me')
     assert r.status_code == 401
+
+def test_get_profile_concurrent_first_requests(client: TestClient, database: Session):
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        responses = list(executor.map(lambda _: client.get('/me', headers={ 'X-Remote-User': 'new.user' }), range(10)))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert len(set(r.json()['id'] for r in responses)) == 1
+
+    users = UserController.get_users(database)
+    assert len(users) == 1
+    assert users[0].username == 'new.user'
@@ -1,9 +1,13 @@
+import json
+
 from .. import client, database, serialize_value
 from ..fixtures import name
 from ..test_data.names import insert_name
 from app.models.names import Name
+from app.streaming import body_reader
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from unittest.mock import patch
 
 
 def test_get_users_list(client: TestClient, database: Session):
@@ -40,6 +44,148 @@ def test_get_users_list(client: TestClient, database: Session):
     r = client.get('/names')
     assert r.status_code == 401
 
+def test_get_names_paginated(client: TestClient, database: Session):
+    names = list(insert_name(database, value=f'name-{i}') for i in range(3))
+    headers = { 'X-Remote-User': 'admin' }
+
+    # First page
+    r = client.get('/names?limit=2', headers=headers)
+    assert r.status_code == 200
+    assert list(n['id'] for n in r.json()) == list(serialize_value(n.id) for n in names[0:2])
+
+    # Last page, without a next cursor
+    r = client.get('/names', params={ 'limit': 2, 'after': r.headers['X-Next-Cursor'] }, headers=headers)
+    assert r.status_code == 200
+    assert list(n['id'] for n in r.json()) == list(serialize_value(n.id) for n in names[2:])
+    assert 'X-Next-Cursor' not in r.headers
+
+    # Invalid cursor
+    r = client.get('/names?limit=2&after=invalid', headers=headers)
+    assert r.status_code == 422
+    assert r.json() == {
+        'detail': [
+            {
+                'loc': ['query', 'after'],
+                'msg': 'invalid cursor',
+                'type': 'value_error.cursor',
+            }
+        ]
+    }
+
+def test_get_names_streamed(client: TestClient, database: Session):
+    for i in range(250):
+        insert_name(database, value=f'name-{i:03}')
+
+    headers = { 'X-Remote-User': 'admin' }
+    expected = client.get('/names', headers=headers).json()
+
+    # With the query parameter
+    r = client.get('/names?stream=1', headers=headers)
+    assert r.status_code == 200
+    assert r.headers['content-type'] == 'application/x-ndjson'
+    assert list(json.loads(line) for line in r.text.splitlines()) == expected
+
+    # With the Accept header, and a page
+    r = client.get('/names?limit=10', headers={ **headers, 'Accept': 'application/x-ndjson' })
+    assert r.status_code == 200
+    assert list(json.loads(line) for line in r.text.splitlines()) == expected[0:10]
+    assert 'X-Next-Cursor' in r.headers
+
+def test_get_names_not_modified(client: TestClient, database: Session):
+    insert_name(database, value='name-1', gender='M')
+    headers = { 'X-Remote-User': 'admin' }
+
+    r = client.get('/names', headers=headers)
+    assert r.status_code == 200
+    assert r.headers['Cache-Control'] == 'private, no-cache'
+    etag = r.headers['ETag']
+
+    # Same representation
+    for if_none_match in [etag, f'W/{etag}', f'"other", {etag}', '*']:
+        r = client.get('/names', headers={ **headers, 'If-None-Match': if_none_match })
+        assert r.status_code == 304
+        assert r.content == b''
+        assert r.headers['ETag'] == etag
+
+    # Other representations
+    assert client.get('/names?gender=M', headers=headers).headers['ETag'] != etag
+    assert client.get('/names?stream=1', headers=headers).headers['ETag'] != etag
+    assert client.get('/names', headers={ **headers, 'If-None-Match': '"other"' }).status_code == 200
+
+    # The catalog changed
+    r = client.post('/names', headers=headers, json={ 'value': 'name-2', 'gender': 'F' })
+    assert r.status_code == 201
+
+    r = client.get('/names', headers={ **headers, 'If-None-Match': etag })
+    assert r.status_code == 200
+    assert r.headers['ETag'] != etag
+    assert len(r.json()) == 2
+
+def test_import_names(client: TestClient, database: Session):
+    insert_name(database, value='Zoé', gender='F')
+    headers = { 'X-Remote-User': 'admin', 'Content-Type': 'text/csv' }
+
+    r = client.post('/names/bulk', headers=headers, data='\ufeffZoé,F\nLéa,F\nLéa,F\nInvalid,T\n'.encode('utf-8'))
+    assert r.status_code == 200
+    assert r.json() == { 'read': 4, 'invalid': 1, 'duplicates': 1, 'inserted': 1, 'skipped': 1 }
+
+    # The catalog is up to date
+    r = client.get('/names', headers={ 'X-Remote-User': 'admin' })
+    assert list(n['value'] for n in r.json()) == ['Léa', 'Zoé']
+
+    # Received in chunks splitting the characters and the lines
+    body = 'Zoé,F\nAmélie,F\nÉlie,M\n'.encode('utf-8')
+    r = client.post('/names/bulk', headers=headers, data=(body[i:i + 3] for i in range(0, len(body), 3)))
+    assert r.status_code == 200
+    assert r.json() == { 'read': 3, 'invalid': 0, 'duplicates': 0, 'inserted': 2, 'skipped': 1 }
+
+    # Not UTF-8
+    r = client.post('/names/bulk', headers=headers, data='Zoé,F'.encode('latin-1'))
+    assert r.status_code == 422
+
+    # Too large, announced or not
+    with patch.object(body_reader, 'max_size', 10):
+        r = client.post('/names/bulk', headers=headers, data=b'Aaron,M\nAbel,M\n')
+        assert r.status_code == 413
+
+        r = client.post('/names/bulk', headers=headers, data=(line for line in [b'Aaron,M\n', b'Abel,M\n']))
+        assert r.status_code == 413
+
+    r = client.get('/names', headers={ 'X-Remote-User': 'admin' })
+    assert list(n['value'] for n in r.json()) == ['Amélie', 'Léa', 'Zoé', 'Élie']
+
+    # Without authent
+    r = client.post('/names/bulk', headers={ 'Content-Type': 'text/csv' }, data=b'Zoe,F')
+    assert r.status_code == 401
+
+def test_search_names(client: TestClient, database: Session):
+    althea = insert_name(database, value='Althéa', gender='F')
+    insert_name(database, value='Alex', gender='M')
+    headers = { 'X-Remote-User': 'admin' }
+
+    r = client.get('/names/search?q=althea', headers=headers)
+    assert r.status_code == 200
+    assert r.json() == [
+        {
+            'id': serialize_value(althea.id),
+            'created_at': serialize_value(althea.created_at),
+            'updated_at': serialize_value(althea.updated_at),
+            'value': 'Althéa',
+            'gender': 'F',
+        }
+    ]
+
+    r = client.get('/names/search?q=al&gender=M', headers=headers)
+    assert list(n['value'] for n in r.json()) == ['Alex']
+
+    # Missing query
+    r = client.get('/names/search', headers=headers)
+    assert r.status_code == 422
+
+    # Without authent
+    r = client.get('/names/search?q=al')
+    assert r.status_code == 401
+
 def test_create_name(client: TestClient, name: Name):
     # Simple
     r = client.post(f'/names', headers={ 'X-Remote-User': 'admin' }, json={
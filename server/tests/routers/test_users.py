@@ -1,3 +1,5 @@
+import json
+
 from .. import client, database, serialize_value
 from ..fixtures import user
 from ..test_data.users import insert_user
@@ -20,6 +22,42 @@ def test_get_users_list(client: TestClient, database: Session):
         } for u in [user_1, user_2]
     )
 
+def test_get_users_list_paginated(client: TestClient, database: Session):
+    users = list(insert_user(database, username=f'user-{i}') for i in range(3))
+    headers = { 'X-Remote-User': users[0].username }
+
+    r = client.get('/users?limit=2', headers=headers)
+    assert r.status_code == 200
+    assert list(u['username'] for u in r.json()) == ['user-0', 'user-1']
+
+    r = client.get('/users', params={ 'limit': 2, 'after': r.headers['X-Next-Cursor'] }, headers=headers)
+    assert r.status_code == 200
+    assert list(u['username'] for u in r.json()) == ['user-2']
+    assert 'X-Next-Cursor' not in r.headers
+
+    r = client.get('/users?after=invalid', headers=headers)
+    assert r.status_code == 422
+
+def test_get_users_list_streamed(client: TestClient, database: Session):
+    for i in range(3):
+        insert_user(database, username=f'user-{i}')
+
+    headers = { 'X-Remote-User': 'user-0' }
+    expected = client.get('/users', headers=headers).json()
+
+    r = client.get('/users', headers={ **headers, 'Accept': 'application/x-ndjson' })
+    assert r.status_code == 200
+    assert r.headers['content-type'] == 'application/x-ndjson'
+    assert list(json.loads(line) for line in r.text.splitlines()) == expected
+
+    # Paginated like the JSON list
+    r = client.get('/users?stream=1&limit=2', headers=headers)
+    assert list(json.loads(line) for line in r.text.splitlines()) == expected[0:2]
+
+    r = client.get(f'/users?stream=1&limit=2&after={r.headers["X-Next-Cursor"]}', headers=headers)
+    assert list(json.loads(line) for line in r.text.splitlines()) == expected[2:]
+    assert 'X-Next-Cursor' not in r.headers
+
 def test_get_users_list_without_authent(client: TestClient):
     r = client.get('/users')
     assert r.status_code == 401
@@ -0,0 +1,78 @@
+import io
+import json
+import logging
+
+from . import database
+from .fixtures import user
+from .test_data.games import insert_game
+from app import get_app
+from app.access_log import access_log, parse_sampling
+from app.models.users import User
+from fastapi.testclient import TestClient
+from pytest import fixture
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+from uuid import uuid4
+
+
+@fixture
+def output():
+    stream = io.StringIO()
+    access_log.start(logging.StreamHandler(stream))
+
+    try:
+        yield stream
+    finally:
+        access_log.stop()
+
+
+def get_entries(stream: io.StringIO) -> List[Dict[str, Any]]:
+    # Wait for the records in the queue
+    access_log.stop()
+
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_access_log(output: io.StringIO, database: Session, user: User):
+    game = insert_game(database, user)
+    client = TestClient(get_app(debug=True, production=True))
+
+    r = client.get(f'/games/{game.id}/guests?limit=10', headers={ 'X-Remote-User': user.username, 'X-Forwarded-For': '10.0.0.1' })
+    assert r.status_code == 200
+
+    entries = get_entries(output)
+    assert len(entries) == 1
+    assert entries[0]['remote_addr'] == '10.0.0.1'
+    assert entries[0]['method'] == 'GET'
+    assert entries[0]['path'] == f'/games/{game.id}/guests'
+    assert entries[0]['query'] == 'limit=10'
+    assert entries[0]['route'] == '/games/{game_id}/guests'
+    assert entries[0]['status'] == 200
+    assert entries[0]['user'] == user.username
+    assert entries[0]['game_id'] == str(game.id)
+    assert entries[0]['db_statements'] >= 2
+    assert entries[0]['duration_ms'] >= entries[0]['db_time_ms'] > 0
+    assert entries[0]['sample_rate'] == 1
+
+
+def test_access_log_sampling(output: io.StringIO, user: User):
+    client = TestClient(get_app(debug=True, production=True, access_log_sampling={ '/me': 0, '/games/{game_id}': 0 }))
+    headers = { 'X-Remote-User': user.username }
+
+    for i in range(5):
+        assert client.get('/me', headers=headers).status_code == 200
+
+    # Errors are always logged
+    assert client.delete(f'/games/{uuid4()}', headers=headers).status_code == 404
+    assert client.get('/health').status_code == 200
+
+    entries = get_entries(output)
+    assert [(e['route'], e['status']) for e in entries] == [('/games/{game_id}', 404), ('/health', 200)]
+
+
+def test_parse_sampling():
+    assert parse_sampling('') == {}
+    assert parse_sampling('/games/{game_id}/stage-1/next=0.1, /names=0.5') == {
+        '/games/{game_id}/stage-1/next': 0.1,
+        '/names': 0.5,
+    }
@@ -0,0 +1,62 @@
+import pytest
+
+from .budgets import RepeatedStatement, StatementBudgetExceeded, StatementBudgetMiddleware
+from app.database import engine
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+def get_client(budgets, repeat_limit: int = 2) -> TestClient:
+    app = FastAPI()
+
+    @app.get('/items/{count}')
+    def get_items(count: int):
+        with engine.connect() as connection:
+            for i in range(count):
+                connection.execute('SELECT 1')
+
+    @app.get('/other/{count}')
+    def get_other(count: int):
+        with engine.connect() as connection:
+            for i in range(count):
+                connection.execute(f'SELECT {i}')
+
+    app.add_middleware(StatementBudgetMiddleware, routes=app.routes, budgets=budgets, repeat_limit=repeat_limit)
+
+    return TestClient(app)
+
+
+def test_statement_budget():
+    client = get_client({ ('GET', '/items/{count}'): 2, ('GET', '/other/{count}'): 3 })
+
+    # Within the budget
+    assert client.get('/items/2').status_code == 200
+    assert client.get('/other/3').status_code == 200
+
+    # Budget exceeded
+    with pytest.raises(StatementBudgetExceeded) as e:
+        client.get('/other/4')
+
+    assert e.value.path == '/other/{count}'
+    assert e.value.budget == 3
+    assert e.value.statements == ['SELECT 0', 'SELECT 1', 'SELECT 2', 'SELECT 3']
+
+    # Unknown routes are not checked
+    assert client.get('/unknown').status_code == 404
+
+
+def test_statement_budget_undeclared():
+    client = get_client({ ('GET', '/items/{count}'): 2 })
+
+    with pytest.raises(AssertionError, match='No SQL statement budget'):
+        client.get('/other/1')
+
+
+def test_repeated_statement():
+    client = get_client({ ('GET', '/items/{count}'): 10 }, repeat_limit=2)
+
+    with pytest.raises(RepeatedStatement) as e:
+        client.get('/items/3')
+
+    assert e.value.statement == 'SELECT 1'
+    assert e.value.count == 3
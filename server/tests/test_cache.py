@@ -0,0 +1,58 @@
+from app.cache import TTLCache
+from unittest.mock import patch
+
+
+def test_get_and_set():
+    cache = TTLCache(maxsize=2, ttl=60)
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.stats() == { 'size': 1, 'maxsize': 2, 'hits': 1, 'misses': 2 }
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    # "a" becomes the most recently used
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+def test_expiration():
+    cache = TTLCache(maxsize=2, ttl=10)
+
+    with patch('app.cache.time.monotonic', return_value=100):
+        cache.set('a', 1)
+
+    with patch('app.cache.time.monotonic', return_value=109):
+        assert cache.get('a') == 1
+
+    with patch('app.cache.time.monotonic', return_value=110):
+        assert cache.get('a') is None
+
+    assert len(cache) == 0
+
+def test_invalidate_and_clear():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    cache.invalidate('a')
+    cache.invalidate('unknown')
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+    cache.clear()
+    assert len(cache) == 0
+
+def test_disabled():
+    cache = TTLCache(maxsize=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
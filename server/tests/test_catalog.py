@@ -0,0 +1,65 @@
+import pytest
+
+from . import database, serialize_value
+from .test_data.names import insert_name
+from app.catalog import NameCatalog
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import NoResultFound
+from unittest.mock import patch
+from uuid import UUID
+
+
+def test_snapshot(database: Session):
+    catalog = NameCatalog()
+
+    # Empty catalog
+    snapshot = catalog.snapshot(database)
+    assert len(snapshot) == 0
+
+    # Names are partitioned by gender, in database order
+    male_2 = insert_name(database, value='name-2', gender='M')
+    female = insert_name(database, value='name-1', gender='F')
+    male_3 = insert_name(database, value='name-3', gender='M')
+
+    snapshot = catalog.snapshot(database)
+    assert len(snapshot) == 3
+    assert serialize_value(list(snapshot.list())) == serialize_value([female, male_2, male_3])
+    assert serialize_value(list(snapshot.list('M'))) == serialize_value([male_2, male_3])
+    assert serialize_value(list(snapshot.list('F'))) == serialize_value([female])
+
+    # Lookups
+    assert serialize_value(snapshot.get(male_3.id)) == serialize_value(male_3)
+
+    with pytest.raises(NoResultFound):
+        snapshot.get(UUID('00000000-0000-0000-0000-000000000000'))
+
+def test_snapshot_reload(database: Session):
+    catalog = NameCatalog()
+    insert_name(database, value='name-1')
+
+    snapshot = catalog.snapshot(database)
+
+    # Not reloaded while the version does not change
+    with patch.object(catalog, 'load') as load:
+        assert catalog.snapshot(database) is snapshot
+
+    load.assert_not_called()
+
+    # Reloaded once the table changed
+    insert_name(database, value='name-2')
+    new_snapshot = catalog.snapshot(database)
+    assert new_snapshot.version > snapshot.version
+    assert len(new_snapshot) == 2
+
+def test_snapshot_check_interval(database: Session):
+    catalog = NameCatalog(check_interval=3600)
+    insert_name(database, value='name-1')
+    assert len(catalog.snapshot(database)) == 1
+
+    # The version is not checked during the interval
+    insert_name(database, value='name-2')
+    assert len(catalog.snapshot(database)) == 1
+
+    # Unless the catalog is invalidated
+    catalog.invalidate()
+    assert len(catalog.snapshot(database)) == 2
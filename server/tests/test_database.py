@@ -0,0 +1,204 @@
+from . import client, database
+from .test_data.names import insert_name
+from .fixtures import user
+from .test_data.games import insert_game
+from app import get_app
+from app.database import SlowQueryLog, engine, engine_options, fingerprint_statement, get_engine_options, slow_query_log
+from app.models.users import User
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from pytest import fixture, raises
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+
+def test_get_engine_options(monkeypatch):
+    # Defaults
+    for name in ['DB_POOL_SIZE', 'DB_POOL_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'DB_POOL_RECYCLE', 'DB_POOL_PRE_PING', 'DB_STATEMENT_TIMEOUT', 'DB_MAX_CONNECTIONS', 'APP_WORKERS']:
+        monkeypatch.delenv(name, raising=False)
+
+    assert get_engine_options() == {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30.0,
+        'pool_recycle': -1,
+        'pool_pre_ping': False,
+    }
+
+    # From the environment
+    monkeypatch.setenv('DB_POOL_SIZE', '20')
+    monkeypatch.setenv('DB_POOL_MAX_OVERFLOW', '0')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '2.5')
+    monkeypatch.setenv('DB_POOL_RECYCLE', '3600')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'true')
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT', '5000')
+
+    assert get_engine_options() == {
+        'pool_size': 20,
+        'max_overflow': 0,
+        'pool_timeout': 2.5,
+        'pool_recycle': 3600,
+        'pool_pre_ping': True,
+        'connect_args': {
+            'options': '-c statement_timeout=5000',
+        },
+    }
+
+def test_get_engine_options_connection_budget(monkeypatch):
+    for name in ['DB_POOL_SIZE', 'DB_POOL_MAX_OVERFLOW', 'DB_STATEMENT_TIMEOUT']:
+        monkeypatch.delenv(name, raising=False)
+
+    # 4 workers sharing 40 connections: the defaults fit
+    monkeypatch.setenv('DB_MAX_CONNECTIONS', '40')
+    monkeypatch.setenv('APP_WORKERS', '4')
+    assert get_engine_options()['pool_size'] == 5
+    assert get_engine_options()['max_overflow'] == 5
+
+    # 8 workers sharing 24 connections
+    monkeypatch.setenv('DB_MAX_CONNECTIONS', '24')
+    monkeypatch.setenv('APP_WORKERS', '8')
+    assert get_engine_options()['pool_size'] == 3
+    assert get_engine_options()['max_overflow'] == 0
+
+    # More workers than connections: one each
+    monkeypatch.setenv('APP_WORKERS', '50')
+    assert get_engine_options()['pool_size'] == 1
+    assert get_engine_options()['max_overflow'] == 0
+
+def test_one_connection_per_request(client: TestClient, user: User):
+    username = user.username
+    checkouts = []
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.append(dbapi_connection)
+
+    event.listen(engine, 'checkout', on_checkout)
+
+    try:
+        # The authentication creates the user and commits before the route runs
+        r = client.post('/games', headers={ 'X-Remote-User': 'new.user' }, json={})
+        assert r.status_code == 201
+        assert len(checkouts) == 1
+
+        r = client.get('/games', headers={ 'X-Remote-User': username })
+        assert r.status_code == 200
+        assert len(checkouts) == 2
+    finally:
+        event.remove(engine, 'checkout', on_checkout)
+
+def test_no_connection_without_statement(database: Session, user: User):
+    insert_name(database, value='Zoé', gender='F')
+    headers = { 'X-Remote-User': user.username }
+    database.close()
+
+    # The catalog and the user are loaded once, then served from memory
+    client = TestClient(get_app(debug=True, production=False, name_catalog_check_interval=60))
+    assert client.get('/names', headers=headers).status_code == 200
+
+    # Every connection of the pool is busy
+    held = [engine.connect() for _ in range(engine_options['pool_size'] + engine_options['max_overflow'] - engine.pool.checkedout())]
+
+    try:
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            responses = list(executor.map(lambda i: client.get('/names', headers=headers), range(40)))
+    finally:
+        for connection in held:
+            connection.close()
+
+    assert [r.status_code for r in responses] == [200] * 40
+
+def test_fingerprint_statement():
+    assert fingerprint_statement(
+        "SELECT name.id FROM name\n  WHERE name.id IN (%(id_1_1)s, %(id_1_2)s) AND value = 'it''s' LIMIT 10"
+    ) == 'SELECT name.id FROM name WHERE name.id IN (...) AND value = ? LIMIT ?'
+
+@fixture
+def slow_queries():
+    try:
+        yield slow_query_log
+    finally:
+        slow_query_log.threshold = 0
+        slow_query_log.explain = False
+        slow_query_log.readers = set()
+        slow_query_log.clear()
+
+def test_slow_query_log(slow_queries: SlowQueryLog, database: Session, user: User):
+    game = insert_game(database, user)
+
+    # Every statement is slower than the threshold
+    client = TestClient(get_app(debug=True, production=False, metrics=True, slow_query_threshold=0.001, slow_query_explain=True, slow_query_readers=[user.username]))
+
+    for i in range(2):
+        r = client.get(f'/games/{game.id}/guests', headers={ 'X-Remote-User': user.username })
+        assert r.status_code == 200
+
+    queries = slow_queries.top(100)
+    guests = next(q for q in queries if q.origin == 'app.controllers.games.GameController.get_game_guests')
+
+    assert guests.count == 2
+    assert guests.route == '/games/{game_id}/guests'
+    assert guests.max_time <= guests.total_time
+    assert guests.statement.startswith('SELECT')
+    assert 'Buffers' in guests.plan or 'actual time' in guests.plan
+
+    # Slowest first
+    assert [q.max_time for q in queries] == sorted((q.max_time for q in queries), reverse=True)
+
+    # Without authent
+    r = client.get('/health/slow-queries?limit=1')
+    assert r.status_code == 401
+
+    # Not a reader
+    r = client.get('/health/slow-queries?limit=1', headers={ 'X-Remote-User': 'other' })
+    assert r.status_code == 403
+
+    r = client.get('/health/slow-queries?limit=1', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 200
+    assert r.json()[0]['id'] == slow_queries.top(1)[0].id
+
+def test_slow_query_plan_rolled_back(slow_queries: SlowQueryLog, database: Session):
+    database.execute(text('CREATE TEMPORARY TABLE "explained" (value INTEGER)'))
+    statement = 'WITH inserted AS (INSERT INTO "explained" VALUES (1) RETURNING value) SELECT * FROM inserted'
+
+    # Running the statement again does not insert anything
+    plan = slow_queries.get_plan(database.connection().connection, statement, {})
+    assert 'actual time' in plan
+    assert database.execute(text('SELECT COUNT(*) FROM "explained"')).scalar() == 0
+
+    # Without ANALYZE, the statement is not run
+    plan = slow_queries.get_plan(database.connection().connection, statement, {}, analyze=False)
+    assert 'actual time' not in plan
+
+    database.rollback()
+
+def test_slow_query_can_analyze():
+    assert SlowQueryLog.can_analyze('SELECT name.id FROM name WHERE name.id IN (%(id_1)s) AND EXISTS (SELECT 1)', None)
+    assert SlowQueryLog.can_analyze('SELECT count(game_guest.id) AS count_1 FROM game_guest', None)
+
+    # Locks, function calls
+    assert not SlowQueryLog.can_analyze('SELECT game.id FROM game WHERE game.id = %(id_1)s FOR UPDATE', None)
+    assert not SlowQueryLog.can_analyze('SELECT 1 FROM game FOR NO KEY UPDATE', None)
+    assert not SlowQueryLog.can_analyze('SELECT game_name_tally_rebuild(%(game_name_tally_rebuild_1)s) AS game_name_tally_rebuild_1', None)
+
+def test_slow_query_log_failed_statement(slow_queries: SlowQueryLog, database: Session):
+    slow_queries.threshold = 0.001
+    connection = database.connection()
+    info = dict(connection.info)
+
+    with raises(DBAPIError):
+        connection.execute(text('SELECT 1 / 0'))
+
+    database.rollback()
+
+    # Nothing is left behind on the connection by the failed statement
+    connection = database.connection()
+    connection.execute(text('SELECT 1'))
+    assert connection.info == info
+    assert 'SELECT 1 / 0' not in (q.statement for q in slow_queries.top(100))
+
+def test_slow_query_log_no_explain_in_production(slow_queries: SlowQueryLog):
+    get_app(debug=True, production=True, slow_query_threshold=100, slow_query_explain=True)
+
+    assert slow_queries.threshold == 100
+    assert slow_queries.explain is False
@@ -0,0 +1,103 @@
+from . import database
+from .fixtures import user
+from .test_data.games import insert_game
+from app import get_app
+from app.models.users import User
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pytest import fixture, raises
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+
+@fixture
+def metrics_client():
+    yield TestClient(get_app(debug=True, production=False, metrics=True))
+
+
+def get_sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_metrics(metrics_client: TestClient, database: Session, user: User):
+    game = insert_game(database, user)
+    headers = { 'X-Remote-User': user.username }
+    route = '/games/{game_id}/guests'
+
+    requests = get_sample('http_requests_total', method='GET', route=route, status='200')
+    durations = get_sample('http_request_duration_seconds_count', method='GET', route=route)
+    statements = get_sample('db_statements_total', route=route)
+    statement_durations = get_sample('db_statement_duration_seconds_count', route=route)
+
+    for i in range(3):
+        r = metrics_client.get(f'/games/{game.id}/guests', headers=headers)
+        assert r.status_code == 200
+
+    # Requests are labelled with the templated path of their route
+    assert get_sample('http_requests_total', method='GET', route=route, status='200') == requests + 3
+    assert get_sample('http_request_duration_seconds_count', method='GET', route=route) == durations + 3
+    assert get_sample('http_requests_in_flight', method='GET') == 0
+
+    # Each request gets the user and the game, then the guests
+    executed = get_sample('db_statements_total', route=route) - statements
+    assert executed >= 6
+    assert get_sample('db_statement_duration_seconds_count', route=route) - statement_durations == executed
+
+
+def test_request_metrics_unmatched(metrics_client: TestClient):
+    requests = get_sample('http_requests_total', method='GET', route='<unmatched>', status='404')
+
+    r = metrics_client.get('/unknown/42')
+    assert r.status_code == 404
+
+    assert get_sample('http_requests_total', method='GET', route='<unmatched>', status='404') == requests + 1
+    assert get_sample('http_requests_total', method='GET', route='/unknown/42', status='404') == 0
+
+
+def test_statement_metrics_failed_statement(metrics_client: TestClient, database: Session):
+    connection = database.connection()
+    info = dict(connection.info)
+    statements = get_sample('db_statements_total', route='')
+
+    with raises(DBAPIError):
+        connection.execute(text('SELECT 1 / 0'))
+
+    database.rollback()
+
+    # The failed statement leaves nothing behind and the next one is timed on its own
+    connection = database.connection()
+    connection.execute(text('SELECT 1'))
+    assert connection.info == info
+    assert get_sample('db_statements_total', route='') == statements + 1
+
+
+def test_auth_cache_metrics(metrics_client: TestClient, user: User):
+    headers = { 'X-Remote-User': user.username }
+    lookups = { result: get_sample('auth_cache_lookups_total', result=result) for result in ['hit', 'miss', 'bypass'] }
+
+    for i in range(3):
+        assert metrics_client.get('/me', headers=headers).status_code == 200
+
+    assert metrics_client.post('/games', headers=headers, json={}).status_code == 201
+
+    assert get_sample('auth_cache_lookups_total', result='miss') == lookups['miss'] + 1
+    assert get_sample('auth_cache_lookups_total', result='hit') == lookups['hit'] + 2
+    assert get_sample('auth_cache_lookups_total', result='bypass') == lookups['bypass'] + 1
+
+
+def test_metrics_endpoint(metrics_client: TestClient, user: User):
+    r = metrics_client.get('/me', headers={ 'X-Remote-User': user.username })
+    assert r.status_code == 200
+
+    r = metrics_client.get('/metrics')
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('text/plain')
+    assert 'http_requests_total{method="GET",route="/me",status="200"}' in r.text
+    assert 'db_pool_checkout_wait_seconds_count' in r.text
+
+
+def test_metrics_disabled(database: Session):
+    client = TestClient(get_app(debug=True, production=False))
+
+    assert client.get('/metrics').status_code == 404
@@ -0,0 +1,34 @@
+import pytest
+
+from app.exceptions import InvalidCursor
+from app.pagination import decode_cursor, decode_cursor_or_422, encode_cursor
+from fastapi import HTTPException
+from uuid import UUID
+
+
+def test_encode_decode_cursor():
+    name_id = UUID('12345678-1234-5678-1234-567812345678')
+    cursor = encode_cursor('Althéa', name_id)
+    assert isinstance(cursor, str)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, str, UUID) == ['Althéa', name_id]
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    encode_cursor('value'),
+    encode_cursor('value', 'not-an-uuid'),
+    encode_cursor('value', '12345678-1234-5678-1234-567812345678', 'extra'),
+])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, str, UUID)
+
+def test_decode_cursor_or_422():
+    name_id = UUID('12345678-1234-5678-1234-567812345678')
+    assert decode_cursor_or_422(encode_cursor('Althéa', name_id), str, UUID) == ['Althéa', name_id]
+
+    with pytest.raises(HTTPException) as e:
+        decode_cursor_or_422('not a cursor', str, UUID)
+
+    assert e.value.status_code == 422
+    assert e.value.detail[0]['type'] == 'value_error.cursor'
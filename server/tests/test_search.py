@@ -0,0 +1,71 @@
+import datetime
+import uuid
+
+from app.catalog import CatalogName, CatalogSnapshot
+from app.search import NameIndex, NameSearch, fold, trigrams
+
+
+def get_snapshot(*values, version: int = 1) -> CatalogSnapshot:
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    return CatalogSnapshot(version, list(
+        CatalogName(uuid.uuid4(), value, gender, now, now) for value, gender in sorted(values)
+    ))
+
+
+def search(index: NameIndex, query: str, **kwargs):
+    return list(name.value for name in index.search(query, **kwargs))
+
+
+def test_fold():
+    assert fold('Althéa') == 'althea'
+    assert fold(' Jean-Pierre ') == 'jean pierre'
+    assert fold('Zoë') == 'zoe'
+    assert fold('ÉLOÏSE') == 'eloise'
+    assert fold('--') == ''
+
+
+def test_trigrams():
+    assert trigrams('zoe') == {'  z', ' zo', 'zoe', 'oe '}
+    assert trigrams('') == set()
+
+
+def test_search_prefix():
+    index = NameIndex(get_snapshot(
+        ('Althéa', 'F'), ('Alex', 'M'), ('Alexandre', 'M'), ('Jean-Pierre', 'M'), ('Pierre', 'M'), ('Pierrette', 'F'),
+    ))
+
+    # Accent and case insensitive
+    assert search(index, 'alth') == ['Althéa']
+    assert search(index, 'ALTHEA') == ['Althéa']
+
+    # Exact match, start of name, start of another word
+    assert search(index, 'pierre') == ['Pierre', 'Pierrette', 'Jean-Pierre']
+    assert search(index, 'jean pi') == ['Jean-Pierre']
+
+    # Gender and limit
+    assert search(index, 'pierre', gender='F') == ['Pierrette']
+    assert search(index, 'al', limit=2) == ['Alex', 'Alexandre']
+
+    # Nothing to search
+    assert search(index, ' - ') == []
+
+
+def test_search_fuzzy():
+    index = NameIndex(get_snapshot(('Mohamed', 'M'), ('Mohammed', 'M'), ('Muhammad', 'M'), ('Léa', 'F')))
+
+    # Prefix matches first, then similar names
+    assert search(index, 'mohamed') == ['Mohamed', 'Mohammed']
+    assert search(index, 'mohammad') == ['Mohammed', 'Muhammad', 'Mohamed']
+    assert search(index, 'xyz') == []
+
+
+def test_search_index_per_version():
+    name_search = NameSearch()
+    snapshot = get_snapshot(('Léa', 'F'))
+
+    assert name_search.index(snapshot) is name_search.index(snapshot)
+
+    other = get_snapshot(('Léa', 'F'), ('Zoé', 'F'), version=2)
+    assert name_search.index(other).version == 2
+    assert list(name.value for name in name_search.search(other, 'zoe')) == ['Zoé']
@@ -0,0 +1,56 @@
+from . import client, database
+from .test_data.games import insert_first_stage, insert_game
+from .test_data.names import insert_name
+from .test_data.users import insert_user
+from app import get_app
+from app.catalog import name_catalog
+from app.serialization import NameEncoder, name_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+
+def test_name_encoder(database: Session):
+    names = [
+        insert_name(database, value='Élodie', gender='F'),
+        insert_name(database, value='Zoé', gender='F'),
+    ]
+
+    snapshot = name_catalog.snapshot(database)
+    encoder = NameEncoder()
+    assert set(name.id for name in snapshot.list()) == set(name.id for name in names)
+
+    # Same output with and without the fragments of the snapshot
+    assert encoder.encode(snapshot.list(), snapshot) == encoder.encode(snapshot.list())
+    assert encoder.encode([]) == b'[]'
+
+    # Fragments are rebuilt when the version changes
+    assert encoder.get_fragments(snapshot) is encoder.get_fragments(snapshot)
+
+    insert_name(database, value='Other', gender='M')
+    name_catalog.invalidate()
+    assert len(encoder.get_fragments(name_catalog.snapshot(database))) == 3
+
+
+def test_fast_json_wire_format(client: TestClient, database: Session):
+    owner = insert_user(database, username='owner')
+    game = insert_game(database, owner)
+
+    for i, value in enumerate(['Élodie', 'Zoé', 'Anaïs', 'Noël']):
+        name = insert_name(database, value=value, gender='MF'[i % 2])
+        insert_first_stage(database, game, owner, name, choice=True)
+
+    headers = { 'X-Remote-User': owner.username }
+    paths = ['/names', '/names?gender=F', '/names?limit=2', f'/games/{game.id}/stage-1/result']
+    expected = list(client.get(path, headers=headers) for path in paths)
+
+    try:
+        fast_client = TestClient(get_app(debug=True, production=False, fast_json=True))
+
+        for path, r in zip(paths, expected):
+            fast_r = fast_client.get(path, headers=headers)
+            assert fast_r.status_code == r.status_code
+            assert fast_r.headers['content-type'] == r.headers['content-type']
+            assert fast_r.headers.get('X-Next-Cursor') == r.headers.get('X-Next-Cursor')
+            assert fast_r.content == r.content
+    finally:
+        name_encoder.enabled = False
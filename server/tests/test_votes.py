@@ -0,0 +1,58 @@
+from . import database
+from .fixtures import user
+from .test_data.games import insert_first_stage, insert_game
+from .test_data.names import insert_name
+from app.catalog import NameCatalog, name_catalog
+from app.controllers.games import GameController
+from app.models.users import User
+from app.schemas.games import GameFirstStageCreate
+from app.votes import VoteTracker, vote_tracker
+from sqlalchemy.orm import Session
+
+
+def test_first_zero_bits():
+    assert VoteTracker.first_zero_bits(0, 3, 10) == [0, 1, 2]
+    assert VoteTracker.first_zero_bits(0b1011, 3, 10) == [2, 4, 5]
+    assert VoteTracker.first_zero_bits(0b1011, 3, 5) == [2, 4]
+    assert VoteTracker.first_zero_bits(0b11111, 3, 5) == []
+
+def test_next_positions(database: Session, user: User):
+    catalog = NameCatalog()
+    tracker = VoteTracker()
+    game = insert_game(database, user)
+    names = list(insert_name(database, value=f'name-{i}', gender='MF'[i % 2]) for i in range(6))
+    snapshot = catalog.snapshot(database)
+
+    assert tracker.next_positions(database, snapshot, game.id, user.id, count=3) == [0, 1, 2]
+    assert tracker.next_positions(database, snapshot, game.id, user.id, gender='F', count=3) == [1, 3, 5]
+    assert tracker.next_positions(database, snapshot, game.id, user.id, start=4, count=3) == [4, 5]
+
+    # Votes recorded by this process
+    insert_first_stage(database, game, user, names[0])
+    tracker.add(game.id, user.id, [names[0].id], snapshot)
+    assert tracker.next_positions(database, snapshot, game.id, user.id, count=1) == [1]
+    assert tracker.check(database, snapshot, game.id, user.id)
+
+    # Votes recorded by another process are caught by the consistency check
+    insert_first_stage(database, game, user, names[1])
+    insert_first_stage(database, game, user, names[2])
+    assert not tracker.check(database, snapshot, game.id, user.id)
+    assert tracker.next_positions(database, snapshot, game.id, user.id, count=1) == [3]
+    assert tracker.check(database, snapshot, game.id, user.id)
+
+def test_votes_update_bitset(database: Session, user: User):
+    game = insert_game(database, user)
+    names = list(insert_name(database, value=f'name-{i}') for i in range(4))
+
+    # Build the bitset
+    assert GameController.get_first_stage_next(database, game.id, user).id == names[0].id
+
+    GameController.create_first_stage(database, game.id, GameFirstStageCreate(name_id=names[0].id, choice=True), user)
+    GameController.create_first_stages(database, game.id, [
+        GameFirstStageCreate(name_id=names[1].id, choice=True),
+        GameFirstStageCreate(name_id=names[2].id, choice=False),
+    ], user)
+
+    snapshot = name_catalog.snapshot(database)
+    assert vote_tracker.check(database, snapshot, game.id, user.id)
+    assert GameController.get_first_stage_next(database, game.id, user).id == names[3].id